@@ -1,18 +1,168 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, send_from_directory, make_response, g
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from passwords import HashingPool, HashingPoolBusy, dummy_hash, needs_rehash
+import images
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache, wraps
+from itertools import chain
 import os
 import json
+import atexit
+import base64
+import gzip
+import hashlib
+import html
+import queue
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+def load_secret_key():
+    """FARA3_SECRET_KEY, else a random key generated once per deployment into instance/secret_key.
+    
+    The key signs session tokens, so it must never be a value anyone can read
+    from the source. Creating the file by hard link lets concurrent workers
+    agree on a single key.
+    """
+    key = os.environ.get('FARA3_SECRET_KEY')
+    if key:
+        return key
+    path = os.path.join(app.instance_path, 'secret_key')
+    if not os.path.exists(path):
+        os.makedirs(app.instance_path, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as key_file:
+            key_file.write(os.urandom(32).hex())  # Readable by the app's user only
+        try:
+            os.link(temp_path, path)
+        except FileExistsError:
+            pass  # Another worker got there first; use its key
+        finally:
+            os.remove(temp_path)
+    with open(path, encoding='ascii') as key_file:
+        return key_file.read().strip()
+
 # Database Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///fara3.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('FARA3_DATABASE_URI', 'sqlite:///fara3.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'fara3-fashion-2024-secret-key'
+app.config['SECRET_KEY'] = load_secret_key()  # Signs session tokens
+app.config['CATALOG_CACHE_MAX_BYTES'] = 8 * 1024 * 1024  # Serialized catalog responses kept in memory
+app.config['ROW_FRAGMENT_CACHE_MAX_BYTES'] = 16 * 1024 * 1024  # Encoded product rows kept in memory
+app.config['DATABASE_PROFILE'] = os.environ.get('FARA3_DB_PROFILE', 'production')  # production or default
+app.config['PASSWORD_HASH_WORKERS'] = 2  # Concurrent scrypt jobs, each ~16 MiB and one core
+app.config['PASSWORD_HASH_MAX_PENDING'] = 32  # Logins beyond this get 503 instead of queueing
+app.config['AUTH_TOKEN_MAX_AGE'] = 7 * 24 * 3600  # Seconds a login token stays valid
+app.config['WRITE_BEHIND_MAX_PENDING'] = 1000  # Queued non-critical rows before 429
+app.config['WRITE_BEHIND_BATCH_SIZE'] = 200  # Rows per flush transaction
+app.config['WRITE_BEHIND_INTERVAL'] = 0.25  # Seconds a batch waits to fill up
+app.config['JSON_PROVIDER'] = os.environ.get('FARA3_JSON_PROVIDER', 'fast')  # fast or default
+app.config['COMPRESSION_MIN_BYTES'] = 1024  # Smaller bodies are sent as-is
+app.config['COMPRESSION_LEVEL'] = 6  # gzip/deflate level; brotli uses quality 5
+app.config['COMPRESSION_CACHE_MAX_BYTES'] = 8 * 1024 * 1024  # Compressed bodies kept per ETag
+app.config['IMAGE_CACHE_DIR'] = os.environ.get('FARA3_IMAGE_CACHE_DIR',
+                                               os.path.join(app.instance_path, 'image-variants'))
+app.config['IMAGE_CACHE_MAX_BYTES'] = 256 * 1024 * 1024  # Rendered /img variants kept on disk
+
+# =============== DATABASE PROFILE ===============
+# PRAGMAs run on every new SQLite connection, per profile
+SQLITE_PRAGMAS = {
+    'production': [
+        ('journal_mode', 'WAL'),  # Readers no longer block on cart/order commits
+        ('synchronous', 'NORMAL'),  # Safe with WAL, fsync only at checkpoints
+        ('busy_timeout', 5000),  # ms to wait on a locked database before failing
+        ('cache_size', -64 * 1024),  # Negative means KiB, i.e. 64 MiB page cache
+        ('mmap_size', 256 * 1024 * 1024),
+        ('temp_store', 'MEMORY'),
+    ],
+    'default': [],
+}
+
+if app.config['DATABASE_PROFILE'] not in SQLITE_PRAGMAS:
+    raise ValueError(f"Unknown FARA3_DB_PROFILE {app.config['DATABASE_PROFILE']!r}")
+
+if app.config['DATABASE_PROFILE'] == 'production' and ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI']:
+    # In-memory databases keep Flask-SQLAlchemy's single shared connection instead
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 10,
+        'pool_recycle': 3600,
+    }
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS[app.config['DATABASE_PROFILE']]:
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+# =============== JSON PROVIDER ===============
+try:
+    import orjson  # Optional accelerated encoder
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Datetimes go through the provider's default so both backends format them the same way
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+def dumps_bytes(obj, default=None):
+    """Compact, unsorted, unescaped UTF-8 JSON, via orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+        except TypeError:
+            pass  # e.g. integers wider than 64 bits, which the stdlib encoder handles
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':')).encode()
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that writes UTF-8 bytes straight into responses.
+    
+    Keys keep insertion order and non-ASCII text is not escaped, so each
+    letter of the brand name costs 4 bytes instead of a 12-byte surrogate
+    pair escape. Pretty-printed debug responses are left to the default.
+    """
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, self.default).decode()
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.default), mimetype=self.mimetype)
+
+JSON_PROVIDERS = {'fast': FastJSONProvider, 'default': DefaultJSONProvider}
+
+if app.config['JSON_PROVIDER'] not in JSON_PROVIDERS:
+    raise ValueError(f"Unknown FARA3_JSON_PROVIDER {app.config['JSON_PROVIDER']!r}")
+app.json = JSON_PROVIDERS[app.config['JSON_PROVIDER']](app)
 
 # Initialize Database
 db = SQLAlchemy(app)
@@ -22,7 +172,7 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    password = db.Column(db.String(200), nullable=False)  # In production, hash passwords!
+    password = db.Column(db.String(200), nullable=False)  # Hash in passwords.py format
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
@@ -43,16 +193,36 @@ class Collection(db.Model):
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
+    name = db.Column(db.String(200), nullable=False, unique=True, index=True)
     description = db.Column(db.Text)
     details = db.Column(db.Text)
     price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(300))
-    collection_id = db.Column(db.Integer, db.ForeignKey('collection.id'))
-    category = db.Column(db.String(100))
+    collection_id = db.Column(db.Integer, db.ForeignKey('collection.id'), index=True)
+    category = db.Column(db.String(100), index=True)
     stock = db.Column(db.Integer, default=10)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    is_featured = db.Column(db.Boolean, default=False)
+    is_featured = db.Column(db.Boolean, default=False, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_product_created_at_id', 'created_at', 'id'),  # Keyset pagination order
+    )
+
+class ProductFacetCount(db.Model):
+    """Product counts per (collection, category, price bucket, in stock, featured), kept current by triggers"""
+    collection_id = db.Column(db.Integer, primary_key=True)  # 0 when the product has no collection
+    category = db.Column(db.String(100), primary_key=True)  # '' when the product has no category
+    price_bucket = db.Column(db.Integer, primary_key=True)  # Index into PRICE_BUCKET_EDGES ranges
+    in_stock = db.Column(db.Boolean, primary_key=True)
+    is_featured = db.Column(db.Boolean, primary_key=True)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+
+class CatalogChange(db.Model):
+    """Product and collection writes logged by triggers, so every process can tell what its caches hold stale"""
+    seq = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer)  # NULL when a collection changed, which touches every product
+    
+    __table_args__ = {'sqlite_autoincrement': True}  # seq never goes back, even once old rows are pruned
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -67,9 +237,12 @@ class Order(db.Model):
     # Relationship
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
 
+# Order history is always read newest-first per user, id breaking ties
+db.Index('ix_order_user_id_order_date_id', Order.user_id, Order.order_date.desc(), Order.id.desc())
+
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     product_name = db.Column(db.String(200))
     quantity = db.Column(db.Integer, nullable=False)
@@ -85,6 +258,16 @@ class CartItem(db.Model):
     
     # Relationship
     product = db.relationship('Product', backref='cart_items')
+    
+    __table_args__ = (
+        # One row per product per cart; also serves every user_id lookup
+        db.Index('ix_cart_item_user_id_product_id', 'user_id', 'product_id', unique=True),
+    )
+
+class OrderSequence(db.Model):
+    """Single-row counter that hands out blocks of order number sequence values"""
+    id = db.Column(db.Integer, primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
 
 class ContactMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -94,146 +277,589 @@ class ContactMessage(db.Model):
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False)
 
+# =============== MIGRATIONS ===============
+def merge_duplicate_cart_items():
+    """Fold repeated (user_id, product_id) cart rows into one so the unique index can be built"""
+    db.session.execute(db.text(
+        "UPDATE cart_item SET quantity = ("
+        "  SELECT SUM(c.quantity) FROM cart_item AS c"
+        "  WHERE c.user_id = cart_item.user_id AND c.product_id = cart_item.product_id"
+        ") WHERE id IN ("
+        "  SELECT MIN(id) FROM cart_item GROUP BY user_id, product_id HAVING COUNT(*) > 1"
+        ")"
+    ))
+    db.session.execute(db.text(
+        "DELETE FROM cart_item WHERE id NOT IN ("
+        "  SELECT MIN(id) FROM cart_item GROUP BY user_id, product_id"
+        ")"
+    ))
+    db.session.commit()
+
+# FTS5 index over product text plus the collection's display name; rowid is product.id.
+# Triggers keep it in sync with every write path, including bulk Core INSERTs.
+PRODUCT_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE product_search USING fts5("
+    "  name, description, details, collection,"
+    "  tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    # bm25 weights per column, used by ORDER BY rank
+    "INSERT INTO product_search(product_search, rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0, 4.0)')",
+    "CREATE TRIGGER product_search_insert AFTER INSERT ON product BEGIN"
+    "  INSERT INTO product_search(rowid, name, description, details, collection)"
+    "  VALUES (new.id, new.name, new.description, new.details,"
+    "          (SELECT display_name FROM collection WHERE id = new.collection_id));"
+    " END",
+    "CREATE TRIGGER product_search_update"
+    " AFTER UPDATE OF name, description, details, collection_id ON product BEGIN"
+    "  UPDATE product_search SET name = new.name, description = new.description, details = new.details,"
+    "    collection = (SELECT display_name FROM collection WHERE id = new.collection_id)"
+    "  WHERE rowid = new.id;"
+    " END",
+    "CREATE TRIGGER product_search_delete AFTER DELETE ON product BEGIN"
+    "  DELETE FROM product_search WHERE rowid = old.id;"
+    " END",
+    "CREATE TRIGGER product_search_collection_update AFTER UPDATE OF display_name ON collection BEGIN"
+    "  UPDATE product_search SET collection = new.display_name"
+    "  WHERE rowid IN (SELECT id FROM product WHERE collection_id = new.id);"
+    " END",
+    "CREATE TRIGGER product_search_collection_delete AFTER DELETE ON collection BEGIN"
+    "  UPDATE product_search SET collection = NULL"
+    "  WHERE rowid IN (SELECT id FROM product WHERE collection_id = old.id);"
+    " END",
+]
+
+def create_product_search():
+    """Create the product_search FTS5 index and its triggers, filling it from existing products"""
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_search'"
+    )).first()
+    if exists:
+        return
+    for statement in PRODUCT_SEARCH_DDL:
+        db.session.execute(db.text(statement))
+    db.session.execute(db.text(
+        "INSERT INTO product_search(rowid, name, description, details, collection)"
+        " SELECT product.id, product.name, product.description, product.details, collection.display_name"
+        " FROM product LEFT JOIN collection ON collection.id = product.collection_id"
+    ))
+    db.session.commit()
+    print("🔧 Created full-text index product_search")
+
+# Price facet ranges: [0, 25), [25, 50), ... [250, ∞)
+PRICE_BUCKET_EDGES = (25, 50, 75, 100, 150, 250)
+
+def product_facet_key(row):
+    """SQL for the product_facet_count key of a trigger's old or new row"""
+    bucket = ' + '.join(f"({row}.price >= {edge})" for edge in PRICE_BUCKET_EDGES)
+    return (f"coalesce({row}.collection_id, 0), coalesce({row}.category, ''), "
+            f"{bucket}, coalesce({row}.stock, 0) > 0, coalesce({row}.is_featured, 0)")
+
+PRODUCT_FACET_KEY = "collection_id, category, price_bucket, in_stock, is_featured"
+
+def product_facet_increment(row):
+    return (f"  INSERT INTO product_facet_count({PRODUCT_FACET_KEY}, product_count)"
+            f"  VALUES ({product_facet_key(row)}, 1)"
+            f"  ON CONFLICT({PRODUCT_FACET_KEY}) DO UPDATE SET product_count = product_count + 1;")
+
+def product_facet_decrement(row):
+    return (f"  UPDATE product_facet_count SET product_count = product_count - 1"
+            f"  WHERE ({PRODUCT_FACET_KEY}) = ({product_facet_key(row)});")
+
+# Stock changes on every order, but only crossing zero moves a product between rows
+PRODUCT_FACET_DDL = [
+    "CREATE TRIGGER product_facet_insert AFTER INSERT ON product BEGIN"
+    f"{product_facet_increment('new')}"
+    " END",
+    "CREATE TRIGGER product_facet_update AFTER UPDATE OF collection_id, category, price, stock, is_featured ON product"
+    f" WHEN ({product_facet_key('old')}) <> ({product_facet_key('new')}) BEGIN"
+    f"{product_facet_decrement('old')}"
+    f"{product_facet_increment('new')}"
+    " END",
+    "CREATE TRIGGER product_facet_delete AFTER DELETE ON product BEGIN"
+    f"{product_facet_decrement('old')}"
+    " END",
+]
+
+PRODUCT_FACET_TRIGGERS = ['product_facet_insert', 'product_facet_update', 'product_facet_delete']
+
+def create_product_facets():
+    """Create the product_facet_count triggers and count the existing products into it"""
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'product_facet_insert'"
+    )).first()
+    columns = {row[1] for row in db.session.execute(db.text('PRAGMA table_info(product_facet_count)'))}
+    if exists and 'is_featured' in columns:
+        return
+    if 'is_featured' not in columns:
+        # Built by schema v3, before featured was a facet dimension: the key changed, so start over
+        for name in PRODUCT_FACET_TRIGGERS:
+            db.session.execute(db.text(f'DROP TRIGGER IF EXISTS "{name}"'))
+        db.session.execute(db.text('DROP TABLE product_facet_count'))
+        ProductFacetCount.__table__.create(db.session.connection())
+    for statement in PRODUCT_FACET_DDL:
+        db.session.execute(db.text(statement))
+    db.session.execute(db.delete(ProductFacetCount))
+    db.session.execute(db.text(
+        f"INSERT INTO product_facet_count({PRODUCT_FACET_KEY}, product_count)"
+        f" SELECT {product_facet_key('product')}, count(*) FROM product GROUP BY 1, 2, 3, 4, 5"
+    ))
+    db.session.commit()
+    print("🔧 Created facet counts product_facet_count")
+
+# Rows of catalog_change kept; a process that falls further behind drops all it has cached
+CATALOG_CHANGE_LOG_ROWS = 10000
+
+# Logged in the writing transaction, whichever process or tool commits it
+CATALOG_CHANGE_DDL = [
+    "CREATE TRIGGER catalog_change_product_insert AFTER INSERT ON product BEGIN"
+    "  INSERT INTO catalog_change(product_id) VALUES (new.id);"
+    " END",
+    "CREATE TRIGGER catalog_change_product_update AFTER UPDATE ON product BEGIN"
+    "  INSERT INTO catalog_change(product_id) VALUES (new.id);"
+    " END",
+    "CREATE TRIGGER catalog_change_product_delete AFTER DELETE ON product BEGIN"
+    "  INSERT INTO catalog_change(product_id) VALUES (old.id);"
+    " END",
+    *(f"CREATE TRIGGER catalog_change_collection_{action.lower()} AFTER {action} ON collection BEGIN"
+      "  INSERT INTO catalog_change(product_id) VALUES (NULL);"
+      " END" for action in ('INSERT', 'UPDATE', 'DELETE')),
+    # Pruned a thousand rows at a time
+    "CREATE TRIGGER catalog_change_prune AFTER INSERT ON catalog_change WHEN new.seq % 1000 = 0 BEGIN"
+    f"  DELETE FROM catalog_change WHERE seq <= new.seq - {CATALOG_CHANGE_LOG_ROWS};"
+    " END",
+]
+
+def create_catalog_changes():
+    """Create the catalog_change triggers"""
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'catalog_change_prune'"
+    )).first()
+    if exists:
+        return
+    for statement in CATALOG_CHANGE_DDL:
+        db.session.execute(db.text(statement))
+    db.session.commit()
+    print("🔧 Created catalog change log catalog_change")
+
+# Bump whenever models, indexes or migrations change; stored in PRAGMA user_version
+SCHEMA_VERSION = 5
+
+# Indexes created by earlier versions and since replaced by a wider one
+OBSOLETE_INDEXES = ['ix_order_user_id_order_date']
+
+def migrate_database():
+    """Create declared indexes, the search index, facet counts and the catalog change log when missing from an older database"""
+    for name in OBSOLETE_INDEXES:
+        db.session.execute(db.text(f'DROP INDEX IF EXISTS "{name}"'))
+    db.session.commit()
+    
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                continue
+            if index.name == 'ix_cart_item_user_id_product_id':
+                merge_duplicate_cart_items()
+            try:
+                index.create(bind=db.engine)
+                print(f"🔧 Created index {index.name}")
+            except IntegrityError:
+                print(f"⚠️ Could not create unique index {index.name}: duplicate rows in {table.name}")
+    
+    create_product_search()
+    create_product_facets()
+    create_catalog_changes()
+
 # =============== CREATE DATABASE & SAMPLE DATA ===============
+SEED_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seed_data.json')
+
+def seed_sample_data():
+    """Bulk-insert the collections and products from seed_data.json into an empty catalog"""
+    if db.session.execute(db.select(Collection.id).limit(1)).first() is not None:
+        return
+    
+    print("📦 Creating sample collections and products...")
+    with open(SEED_DATA_PATH, encoding='utf-8') as seed_file:
+        seed = json.load(seed_file)
+    
+    db.session.execute(db.insert(Collection), seed['collections'])
+    collection_ids = dict(db.session.execute(db.select(Collection.name, Collection.id)).all())
+    products = []
+    for product in seed['products']:
+        product['collection_id'] = collection_ids.get(product.pop('collection_name', None))
+        products.append(product)
+    db.session.execute(db.insert(Product), products)
+    print(f"✅ Created {len(seed['collections'])} collections and {len(products)} products!")
+
 def initialize_database():
+    """Create, migrate and seed the database unless it is already at SCHEMA_VERSION"""
     with app.app_context():
-        # Create all tables
+        if db.session.execute(db.text('PRAGMA user_version')).scalar() == SCHEMA_VERSION:
+            db.session.rollback()
+            print(f"📊 Database schema v{SCHEMA_VERSION} is up to date.")
+            return
+        
         db.create_all()
+        migrate_database()
+        seed_sample_data()
+        db.session.execute(db.text(f'PRAGMA user_version = {SCHEMA_VERSION}'))
+        db.session.commit()
+        print(f"✅ Database created successfully! (schema v{SCHEMA_VERSION})")
+
+# =============== CATALOG QUERIES ===============
+def catalog_products_query():
+    """Products with their collection eager-loaded through a single LEFT JOIN"""
+    return Product.query.outerjoin(Collection, Product.collection_id == Collection.id) \
+        .options(db.contains_eager(Product.collection))
+
+def collections_with_counts():
+    """All collections paired with their product count from one GROUP BY"""
+    return db.session.query(Collection, db.func.count(Product.id)) \
+        .outerjoin(Product, Product.collection_id == Collection.id) \
+        .group_by(Collection.id) \
+        .order_by(Collection.id) \
+        .all()
+
+# Columns /api/products can project with ?fields=, labelled with their JSON key
+PRODUCT_LIST_FIELDS = {
+    'id': Product.id.label('id'),
+    'name': Product.name.label('name'),
+    'description': Product.description.label('description'),
+    'details': Product.details.label('details'),
+    'price': Product.price.label('price'),
+    'image_url': Product.image_url.label('image_url'),
+    'collection': Collection.name.label('collection'),
+    'stock': Product.stock.label('stock'),
+    'is_featured': Product.is_featured.label('is_featured'),
+    'created_at': Product.created_at.label('created_at'),
+}
+
+def encode_cursor(timestamp, row_id):
+    """Opaque keyset cursor for the (timestamp, id) position of the last row on a page"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor, raises ValueError on a malformed cursor"""
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    timestamp, row_id = raw.split('|')
+    return datetime.fromisoformat(timestamp), int(row_id)
+
+def product_list_query(fields):
+    """SELECT only the requested columns, plus the keyset columns, in page order"""
+    query = db.session.query(
+        Product.created_at.label('cursor_created_at'),
+        Product.id.label('cursor_id'),
+        *[PRODUCT_LIST_FIELDS[field] for field in fields]
+    ).select_from(Product)
+    return query.order_by(Product.created_at, Product.id)
+
+def product_detail(product):
+    """Single-product payload shared by the by-id and by-name endpoints"""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'details': product.details,
+        'price': product.price,
+        'image_url': product.image_url,
+        'collection': product.collection.name if product.collection else None,
+        'stock': product.stock,
+        'is_featured': product.is_featured
+    }
+
+# =============== ROW SERIALIZERS ===============
+# Encoders for the column types the catalog returns; anything else goes through dumps_bytes
+JSON_VALUE_ENCODERS = {
+    type(None): lambda value: b'null',
+    bool: lambda value: b'true' if value else b'false',
+    int: lambda value: b'%d' % value,
+    float: dumps_bytes,
+    str: dumps_bytes,
+    datetime: lambda value: b'"' + value.isoformat().encode() + b'"',
+}
+
+def encode_json_value(value):
+    encode = JSON_VALUE_ENCODERS.get(type(value))
+    return encode(value) if encode else dumps_bytes(value)
+
+class RowEncoder:
+    """UTF-8 JSON object encoder compiled for one ordered field list.
+    
+    The '"field":' key fragments are encoded once; encoding a row only
+    encodes its values, read as attributes (labelled Rows or ORM objects).
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._keys = [(b',' if i else b'') + dumps_bytes(field) + b':' for i, field in enumerate(self.fields)]
+
+    def encode(self, row):
+        parts = [b'{']
+        for key, field in zip(self._keys, self.fields):
+            parts.append(key)
+            parts.append(encode_json_value(getattr(row, field)))
+        parts.append(b'}')
+        return b''.join(parts)
+
+@lru_cache(maxsize=256)
+def row_encoder(fields):
+    """Shared RowEncoder per field tuple (?fields= can ask for any combination)"""
+    return RowEncoder(fields)
+
+def json_array(fragments):
+    return b'[' + b','.join(fragments) + b']'
+
+class RowFragmentCache:
+    """Size-bounded LRU of encoded rows, keyed by (table, id) and then field tuple.
+    
+    Rows are dropped individually when the unit of work flushes them and
+    all at once on bulk writes; writes from other processes reach it the
+    same way through catalog_changes. Every drop bumps generation, and
+    fragments encoded from rows read before the drop are not stored.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self._rows = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def encode_rows(self, model, encoder, rows, row_ids, generation):
+        """Encoded fragment per row, running encoder only for rows not cached yet"""
+        table = model.__tablename__
+        with self._lock:
+            fragments = []
+            for row_id in row_ids:
+                entry = self._rows.get((table, row_id))
+                fragments.append(entry.get(encoder.fields) if entry is not None else None)
+                if entry is not None:
+                    self._rows.move_to_end((table, row_id))
         
-        print("✅ Database created successfully!")
+        misses = [i for i, fragment in enumerate(fragments) if fragment is None]
+        for i in misses:
+            fragments[i] = encoder.encode(rows[i])
         
-        # Check if collections already exist
-        if Collection.query.count() == 0:
-            print("📦 Creating sample collections and products...")
-            
-            # Create collections
-            collections_data = [
-                {
-                    "name": "minimalist",
-                    "display_name": "HOODIES",
-                    "description": "Clean lines & neutral tones",
-                    "image_url": "https://images.unsplash.com/photo-1556821840-3a63f95609a7?ixlib=rb-4.0.3&auto=format&fit=crop&w=774&q=80"
-                },
-                {
-                    "name": "streetwear",
-                    "display_name": "Streetwear",
-                    "description": "Bold prints & urban style",
-                    "image_url": "a1111.png"
-                },
-                {
-                    "name": "Pants",
-                    "display_name": "PANTS",
-                    "description": "Classic and modern pants",
-                    "image_url": "abde.jpg"
-                },
-                {
-                    "name": "new arrivals",
-                    "display_name": "Sports Wear",
-                    "description": "Latest 𝐹𝒶𝓇𝒶`𝟥 designs",
-                    "image_url": "sport.jpg"
-                },
-                {
-                    "name": "oversized fit",
-                    "display_name": "Oversized Collection",
-                    "description": "Loose, trending silhouettes",
-                    "image_url": "oversize3.jpg"
-                },
-                {
-                    "name": "summer drop",
-                    "display_name": "SHIRTS",
-                    "description": "Striped & Smooth",
-                    "image_url": "shirt.jpg"
-                },
-                {
-                    "name": "everyday basics",
-                    "display_name": "COATS",
-                    "description": "MAXI FUR COAT",
-                    "image_url": "coat.jpg"
-                },
-                {
-                    "name": "Hats",
-                    "display_name": "HATS",
-                    "description": "Bold prints & urban style",
-                    "image_url": "hats.jpg"
-                }
-            ]
-            
-            collections_dict = {}
-            for col_data in collections_data:
-                collection = Collection(
-                    name=col_data['name'],
-                    display_name=col_data['display_name'],
-                    description=col_data['description'],
-                    image_url=col_data['image_url']
-                )
-                db.session.add(collection)
-                db.session.flush()  # Get the ID
-                collections_dict[col_data['name']] = collection.id
-            
-            # Create products based on your JavaScript data
-            products_data = [
-                # Minimalist Collection (Hoodies)
-                {"name": "Black Hoodie", "description": "Clean minimalist design", 
-                 "details": "100% premium cotton, available in black, white, and grey.", 
-                 "price": 35.00, "image_url": "aaa.jpg", "collection_name": "minimalist", "stock": 25},
-                {"name": "White Hoodie", "description": "Basic comfort hoodie", 
-                 "details": "Soft fleece interior, ribbed cuffs and hem.", 
-                 "price": 45.00, "image_url": "aaaa.jpg", "collection_name": "minimalist", "stock": 20},
-                
-                # Streetwear Collection
-                {"name": "RED Street wear", "description": "Urban street style", 
-                 "details": "Bold graphics, relaxed fit.", 
-                 "price": 55.00, "image_url": "aaaaa.jpg", "collection_name": "streetwear", "stock": 15},
-                {"name": "Black Street Wear", "description": "Streetwear essential", 
-                 "details": "Water-resistant material, multiple pockets.", 
-                 "price": 50.00, "image_url": "aaaaaa.jpg", "collection_name": "streetwear", "stock": 18},
-                
-                # Pants Collection
-                {"name": "MEN pant", "description": "Cool pants outwear", 
-                 "details": "Classic oversized MEN pants", 
-                 "price": 60.00, "image_url": "a.pant.jpg", "collection_name": "Pants", "stock": 30},
-                {"name": "WOMEN PANTS", "description": "Classic WOMEN PANTS", 
-                 "details": "Classic WOMEN PANTS", 
-                 "price": 65.00, "image_url": "b.pant.jpg", "collection_name": "Pants", "stock": 28},
-                
-                # New Arrivals (Sports Wear)
-                {"name": "Liverpool T-Shirt", "description": "Latest collection", 
-                 "details": "Limited edition design", 
-                 "price": 70.00, "image_url": "liver.jpg", "collection_name": "new arrivals", "stock": 12},
-                {"name": "Barcelona T-Shirt", "description": "Latest collection", 
-                 "details": "Limited edition design", 
-                 "price": 70.00, "image_url": "barca.jpg", "collection_name": "new arrivals", "stock": 15},
-                
-                # Featured Products (Best Sales)
-                {"name": "𝐹𝒶𝓇𝒶`𝟥 Classic T-Shirt", "description": "Soft cotton, black or white", 
-                 "details": "Premium quality cotton t-shirt", 
-                 "price": 55.00, "image_url": "main.png", "is_featured": True, "stock": 50},
-                {"name": "𝐹𝒶𝓇𝒶`𝟥 Original Pant", "description": "Bold logo, streetwear fit", 
-                 "details": "Original design pants", 
-                 "price": 65.00, "image_url": "main2.png", "is_featured": True, "stock": 40}
-            ]
-            
-            for prod_data in products_data:
-                product = Product(
-                    name=prod_data['name'],
-                    description=prod_data['description'],
-                    details=prod_data['details'],
-                    price=prod_data['price'],
-                    image_url=prod_data['image_url'],
-                    stock=prod_data.get('stock', 10),
-                    is_featured=prod_data.get('is_featured', False)
-                )
-                
-                # Assign to collection if specified
-                if 'collection_name' in prod_data and prod_data['collection_name'] in collections_dict:
-                    product.collection_id = collections_dict[prod_data['collection_name']]
-                
-                db.session.add(product)
-            
-            db.session.commit()
-            print(f"✅ Created {Collection.query.count()} collections and {Product.query.count()} products!")
+        if misses:
+            with self._lock:
+                if generation == self.generation:
+                    for i in misses:
+                        entry = self._rows.setdefault((table, row_ids[i]), {})
+                        if encoder.fields in entry:
+                            continue  # Another thread missed the same row and stored it first
+                        entry[encoder.fields] = fragments[i]
+                        self._size += len(fragments[i])
+                    while self._size > self.max_bytes:
+                        _, evicted = self._rows.popitem(last=False)
+                        self._size -= sum(map(len, evicted.values()))
+        return fragments
+
+    def invalidate(self, model, row_ids=None):
+        """Drop the given rows of model, or every cached row when row_ids is None"""
+        table = model.__tablename__
+        with self._lock:
+            self.generation += 1
+            if row_ids is None:
+                self._rows.clear()
+                self._size = 0
+                return
+            for row_id in row_ids:
+                evicted = self._rows.pop((table, row_id), None)
+                if evicted is not None:
+                    self._size -= sum(map(len, evicted.values()))
+
+row_fragments = RowFragmentCache(app.config['ROW_FRAGMENT_CACHE_MAX_BYTES'])
+
+def encode_product_rows(fields, rows, generation):
+    """Encoded product list rows; rows come from product_list_query and carry cursor_id"""
+    return row_fragments.encode_rows(Product, row_encoder(tuple(fields)), rows,
+                                     [row.cursor_id for row in rows], generation)
+
+# =============== CATALOG CACHE ===============
+class CatalogCache:
+    """Versioned, size-bounded LRU of serialized catalog responses"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.version = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != self.version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            # The catalog changed while this response was being rendered
+            if version != self.version:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (version, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._size = 0
+
+catalog_cache = CatalogCache(app.config['CATALOG_CACHE_MAX_BYTES'])
+CATALOG_MODELS = (Product, Collection)
+CATALOG_TABLES = tuple(model.__table__ for model in CATALOG_MODELS)
+
+def mark_products_dirty(session, product_ids):
+    """Drop product fragments now and remember them for the commit; None means every product.
+    
+    Product fragments embed the collection name, so Collection changes pass None.
+    """
+    dirty = session.info.get('dirty_product_ids', set())
+    dirty = None if dirty is None or product_ids is None else dirty | product_ids
+    session.info['dirty_product_ids'] = dirty
+    row_fragments.invalidate(Product, dirty)
+
+@event.listens_for(db.session, 'after_flush')
+def track_catalog_flush(session, flush_context):
+    """Invalidate as soon as Product/Collection rows are flushed"""
+    changed = [obj for obj in chain(session.new, session.dirty, session.deleted) if isinstance(obj, CATALOG_MODELS)]
+    if changed:
+        session.info['catalog_dirty'] = True
+        catalog_cache.invalidate()
+        mark_products_dirty(session, None if any(isinstance(obj, Collection) for obj in changed)
+                            else {obj.id for obj in changed})
+
+@event.listens_for(db.session, 'do_orm_execute')
+def track_catalog_bulk_write(orm_execute_state):
+    """Invalidate on UPDATE/DELETE/INSERT statements that bypass the unit of work, ORM or Core"""
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    table = mapper.local_table if mapper is not None else getattr(orm_execute_state.statement, 'table', None)
+    if table in CATALOG_TABLES:
+        orm_execute_state.session.info['catalog_dirty'] = True
+        catalog_cache.invalidate()
+        # Statements that know which products they touch say so with this execution option
+        product_ids = orm_execute_state.execution_options.get('product_ids')
+        mark_products_dirty(orm_execute_state.session,
+                            set(product_ids) if product_ids is not None and table is Product.__table__ else None)
+
+@event.listens_for(db.session, 'after_commit')
+def track_catalog_commit(session):
+    # Invalidate again once committed so readers that raced the flush can't keep stale rows
+    if session.info.pop('catalog_dirty', False):
+        catalog_cache.invalidate()
+        row_fragments.invalidate(Product, session.info.pop('dirty_product_ids', None))
+
+@event.listens_for(db.session, 'after_rollback')
+def track_catalog_rollback(session):
+    session.info.pop('catalog_dirty', None)
+    session.info.pop('dirty_product_ids', None)
+
+class CatalogChangeFeed:
+    """Follows catalog_change, so writes committed by other processes reach this one's caches.
+    
+    The session listeners above only see this process's own writes.
+    Every catalog request calls sync() first: one indexed SELECT, which
+    usually returns no rows, on a connection the feed keeps to itself so
+    a cache hit still needs no session or pool checkout. Changed products
+    lose their row fragments one by one, like local writes do.
+    """
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.seq = None  # Last catalog_change row applied
+        self._connection = None
+        self._lock = threading.Lock()
+        self._changes = db.select(CatalogChange.seq, CatalogChange.product_id) \
+            .where(CatalogChange.seq > db.bindparam('seen')).order_by(CatalogChange.seq).limit(batch)
+        self._latest = db.select(db.func.coalesce(db.func.max(CatalogChange.seq), 0))
+
+    def _read(self, statement, parameters=None):
+        if self._connection is None:
+            self._connection = db.engine.connect()
+        try:
+            return self._connection.execute(statement, parameters).all()
+        except Exception:
+            self._connection.close()
+            self._connection = None
+            raise
+        finally:
+            if self._connection is not None:
+                self._connection.rollback()  # Don't hold a read snapshot between requests
+
+    def sync(self):
+        with self._lock:
+            if self.seq is None:
+                # Nothing is cached before the first catalog request, so there is nothing to catch up on
+                self.seq = self._read(self._latest)[0][0]
+                return
+            seen = self.seq
+            rows = self._read(self._changes, {'seen': seen})
+            if not rows:
+                return
+            self.seq = rows[-1].seq if len(rows) < self.batch else self._read(self._latest)[0][0]
+            product_ids = {row.product_id for row in rows}
+            # seq has no gaps, so a missing next row means it was pruned before this process read it
+            if None in product_ids or rows[0].seq != seen + 1 or len(rows) == self.batch:
+                product_ids = None
+            catalog_cache.invalidate()
+            row_fragments.invalidate(Product, product_ids)
+
+catalog_changes = CatalogChangeFeed(batch=1000)
+
+# Distinguishes version counters of different processes/restarts in ETags
+CATALOG_ETAG_PREFIX = os.urandom(4).hex()
+
+def catalog_etag(version, key):
+    """Strong ETag for one URL's representation at one catalog version"""
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+    return f"{CATALOG_ETAG_PREFIX}-{version}-{digest}"
+
+def catalog_cached(view):
+    """Serve a catalog GET from catalog_cache, keyed by path and query args.
+
+    Responses carry a strong ETag built from the catalog version and the
+    cache key, so a matching If-None-Match is answered with 304 before any
+    cache lookup, query or serialization happens. Writes committed by
+    other processes are caught up on first, through catalog_changes.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        catalog_changes.sync()
+        version = catalog_cache.version
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        etag = catalog_etag(version, key)
+        
+        # Weak comparison, as compressed responses carry the weak form of the ETag
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
         else:
-            print(f"📊 Database already has {Collection.query.count()} collections and {Product.query.count()} products.")
+            body = catalog_cache.get(key)
+            if body is not None:
+                response = app.response_class(body, mimetype='application/json')
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                catalog_cache.put(key, version, response.get_data())
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'  # Always revalidate, 304 is cheap
+        return response
+    return wrapper
 
 # =============== API ROUTES ===============
 
@@ -248,20 +874,27 @@ def home():
         'endpoints': {
             'collections': '/api/collections',
             'products': '/api/products',
+            'facets': '/api/products?facets=true&collection=a,b&min_price=&max_price=&in_stock=true',
             'featured': '/api/products/featured',
+            'lookup': '/api/products/lookup?name=, /api/products?ids=1,2,3',
+            'search': '/api/products/search?q=',
             'users': '/api/users',
             'auth': '/api/auth/login, /api/auth/register',
             'cart': '/api/cart',
             'orders': '/api/orders',
-            'contact': '/api/contact'
+            'contact': '/api/contact',
+            'assets': '/assets/manifest.json'
         }
     })
 
 # =============== COLLECTIONS API ===============
+COLLECTION_PRODUCT_FIELDS = ('id', 'name', 'description', 'details', 'price', 'image_url', 'stock')
+
 @app.route('/api/collections', methods=['GET'])
+@catalog_cached
 def get_collections():
     """Get all collections"""
-    collections = Collection.query.all()
+    collections = collections_with_counts()
     return jsonify({
         'collections': [{
             'id': col.id,
@@ -269,11 +902,12 @@ def get_collections():
             'display_name': col.display_name,
             'description': col.description,
             'image_url': col.image_url,
-            'product_count': len(col.products)
-        } for col in collections]
+            'product_count': product_count
+        } for col, product_count in collections]
     })
 
 @app.route('/api/collections/<string:collection_name>', methods=['GET'])
+@catalog_cached
 def get_collection_products(collection_name):
     """Get products by collection name"""
     collection = Collection.query.filter_by(name=collection_name).first()
@@ -281,98 +915,405 @@ def get_collection_products(collection_name):
     if not collection:
         return jsonify({'error': 'Collection not found'}), 404
     
-    products = Product.query.filter_by(collection_id=collection.id).all()
+    generation = row_fragments.generation
+    rows = product_list_query(COLLECTION_PRODUCT_FIELDS).filter(Product.collection_id == collection.id).all()
     
-    return jsonify({
-        'collection': {
-            'id': collection.id,
-            'name': collection.name,
-            'display_name': collection.display_name
-        },
-        'products': [{
-            'id': p.id,
-            'name': p.name,
-            'description': p.description,
-            'details': p.details,
-            'price': p.price,
-            'image_url': p.image_url,
-            'stock': p.stock
-        } for p in products]
+    header = dumps_bytes({
+        'id': collection.id,
+        'name': collection.name,
+        'display_name': collection.display_name
     })
+    return app.response_class(
+        b'{"collection":' + header + b',"products":' +
+        json_array(encode_product_rows(COLLECTION_PRODUCT_FIELDS, rows, generation)) + b'}',
+        mimetype='application/json'
+    )
 
 # =============== PRODUCTS API ===============
+MAX_BULK_PRODUCT_IDS = 100
+DEFAULT_PRODUCT_PAGE_SIZE = 50
+MAX_PRODUCT_PAGE_SIZE = 200
+FEATURED_PRODUCT_FIELDS = ('id', 'name', 'description', 'price', 'image_url', 'stock')
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_TERMS = 8
+# bm25 costs a few microseconds per match, so only groups of matches up to this size are ranked by it
+SEARCH_RANK_CANDIDATES = 1000
+SEARCH_TERM = re.compile(r'\w+')
+
+def list_arg(name):
+    """Comma-separated query argument as a list of its non-empty values"""
+    return [value.strip() for value in request.args.get(name, '').split(',') if value.strip()]
+
+def price_bucket(price):
+    """Index of the PRICE_BUCKET_EDGES range that price falls in"""
+    return bisect_right(PRICE_BUCKET_EDGES, price)
+
+def product_facet_rows(*where):
+    """product_facet_count rows grouped straight from the products matching where"""
+    key = [
+        db.func.coalesce(Product.collection_id, 0).label('collection_id'),
+        db.func.coalesce(Product.category, '').label('category'),
+        sum(db.cast(Product.price >= edge, db.Integer) for edge in PRICE_BUCKET_EDGES).label('price_bucket'),
+        (db.func.coalesce(Product.stock, 0) > 0).label('in_stock'),
+        db.func.coalesce(Product.is_featured, False).label('is_featured'),
+    ]
+    return db.select(*key, db.func.count().label('product_count')).where(*where).group_by(*key)
+
+def facet_counts(collections, categories, in_stock, min_price, max_price, featured=False, product_ids=None):
+    """Counts per collection, category and price bucket, plus how many are in stock.
+    
+    One statement. Each facet applies every active filter except its own,
+    so a sidebar can show what picking another value would return. Counts
+    are summed from product_facet_count, which knows prices only by
+    bucket: price bounds inside a bucket are widened to whole buckets, and
+    price_range reports the range the counts cover. An ids list, at most
+    MAX_BULK_PRODUCT_IDS products, is grouped from product directly and
+    counted with the exact bounds.
+    """
+    edges = (0,) + PRICE_BUCKET_EDGES + (None,)
+    if product_ids is None:
+        price_range = {'min': None, 'max': None}
+        if min_price is not None:
+            price_range['min'] = edges[price_bucket(min_price)]
+        if max_price is not None:
+            price_range['max'] = edges[bisect_left(PRICE_BUCKET_EDGES, max_price) + 1]
+    else:
+        price_range = {'min': min_price, 'max': max_price}
+    
+    def source(facet):
+        if product_ids is None:
+            return ProductFacetCount.__table__
+        price = []
+        if facet != 'price' and min_price is not None:
+            price.append(Product.price >= min_price)
+        if facet != 'price' and max_price is not None:
+            price.append(Product.price < max_price)
+        return product_facet_rows(Product.id.in_(product_ids), *price).subquery('facet_rows')
+    
+    def counts(facet, value, only=None):
+        rows = source(facet)
+        value = value(rows)
+        total = db.func.sum(rows.c.product_count)
+        query = db.select(db.literal(facet), value, total)
+        if facet == 'collection':
+            query = query.join_from(rows, Collection, Collection.id == rows.c.collection_id)
+        if only is not None:
+            query = query.where(only(rows))
+        if collections and facet != 'collection':
+            query = query.where(rows.c.collection_id.in_(
+                db.select(Collection.id).where(Collection.name.in_(collections))))
+        if categories and facet != 'category':
+            query = query.where(rows.c.category.in_(categories))
+        if in_stock and facet != 'in_stock':
+            query = query.where(rows.c.in_stock == True)
+        if featured:
+            query = query.where(rows.c.is_featured == True)
+        if product_ids is None and facet != 'price':
+            if min_price is not None:
+                query = query.where(rows.c.price_bucket >= price_bucket(min_price))
+            if max_price is not None:
+                query = query.where(rows.c.price_bucket <= bisect_left(PRICE_BUCKET_EDGES, max_price))
+        return query.group_by(value).having(total > 0)
+    
+    rows = db.session.execute(db.union_all(
+        counts('collection', lambda rows: Collection.name),
+        counts('category', lambda rows: rows.c.category, lambda rows: rows.c.category != ''),
+        counts('price', lambda rows: rows.c.price_bucket),
+        counts('in_stock', lambda rows: rows.c.in_stock, lambda rows: rows.c.in_stock == True),
+    )).all()
+    
+    facets = {'collection': [], 'category': [], 'price': [], 'in_stock': 0, 'price_range': price_range}
+    for facet, value, count in sorted(rows, key=lambda row: (row[0], row[1])):
+        if facet == 'price':
+            facets['price'].append({'min': edges[value], 'max': edges[value + 1], 'count': count})
+        elif facet == 'in_stock':
+            facets['in_stock'] = count
+        else:
+            facets[facet].append({'value': value, 'count': count})
+    return facets
+
 @app.route('/api/products', methods=['GET'])
+@catalog_cached
 def get_products():
-    """Get all products with optional filtering"""
-    category = request.args.get('category')
-    collection = request.args.get('collection')
-    featured = request.args.get('featured')
+    """Get products with optional filtering, field projection, cursor pagination and facet counts.
     
-    query = Product.query
+    collection and category take comma-separated values; min_price is
+    inclusive and max_price exclusive, matching the facet price buckets.
+    Facet counts apply the same filters as the products, ids and featured
+    included, with exact price bounds.
+    """
+    categories = list_arg('category')
+    collections = list_arg('collection')
+    featured = request.args.get('featured', '').lower() == 'true'
+    in_stock = request.args.get('in_stock', '').lower() == 'true'
+    with_facets = request.args.get('facets', '').lower() == 'true'
+    ids = request.args.get('ids')
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields')
     
-    if category:
-        query = query.filter_by(category=category)
-    if collection:
-        query = query.join(Collection).filter(Collection.name == collection)
-    if featured and featured.lower() == 'true':
-        query = query.filter_by(is_featured=True)
+    if fields:
+        fields = list(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+        unknown = [field for field in fields if field not in PRODUCT_LIST_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown field(s): {', '.join(unknown)}"}), 400
+    else:
+        fields = list(PRODUCT_LIST_FIELDS)
     
-    products = query.all()
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
     
-    return jsonify({
-        'products': [{
-            'id': p.id,
-            'name': p.name,
-            'description': p.description,
-            'details': p.details,
-            'price': p.price,
-            'image_url': p.image_url,
-            'collection': p.collection.name if p.collection else None,
-            'stock': p.stock,
-            'is_featured': p.is_featured,
-            'created_at': p.created_at.isoformat()
-        } for p in products]
-    })
+    query = product_list_query(fields)
+    if collections or 'collection' in fields:
+        query = query.outerjoin(Collection, Product.collection_id == Collection.id)
+    
+    limit = request.args.get('limit', type=int) or DEFAULT_PRODUCT_PAGE_SIZE
+    product_ids = None
+    if ids:
+        try:
+            product_ids = {int(product_id) for product_id in ids.split(',') if product_id.strip()}
+        except ValueError:
+            return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+        if len(product_ids) > MAX_BULK_PRODUCT_IDS:
+            return jsonify({'error': f'At most {MAX_BULK_PRODUCT_IDS} ids per request'}), 400
+        query = query.filter(Product.id.in_(product_ids))
+        limit = request.args.get('limit', type=int) or len(product_ids)
+    if categories:
+        query = query.filter(Product.category.in_(categories))
+    if collections:
+        query = query.filter(Collection.name.in_(collections))
+    if featured:
+        query = query.filter(Product.is_featured == True)
+    if in_stock:
+        query = query.filter(Product.stock > 0)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price < max_price)
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.tuple_(Product.created_at, Product.id) > db.tuple_(*after))
+    
+    limit = max(1, min(limit, MAX_PRODUCT_PAGE_SIZE))
+    generation = row_fragments.generation
+    rows = query.limit(limit + 1).all()  # One extra row tells us whether there is a next page
+    page = rows[:limit]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last.cursor_created_at, last.cursor_id)
+    
+    body = b'{"products":' + json_array(encode_product_rows(fields, page, generation)) + \
+        b',"next_cursor":' + encode_json_value(next_cursor)
+    if with_facets:
+        body += b',"facets":' + dumps_bytes(facet_counts(collections, categories, in_stock, min_price, max_price,
+                                                           featured, product_ids))
+    return app.response_class(body + b'}', mimetype='application/json')
 
 @app.route('/api/products/featured', methods=['GET'])
+@catalog_cached
 def get_featured_products():
     """Get featured products"""
-    products = Product.query.filter_by(is_featured=True).all()
+    generation = row_fragments.generation
+    rows = product_list_query(FEATURED_PRODUCT_FIELDS).filter(Product.is_featured == True).all()
     
-    return jsonify({
-        'products': [{
-            'id': p.id,
-            'name': p.name,
-            'description': p.description,
-            'price': p.price,
-            'image_url': p.image_url,
-            'stock': p.stock
-        } for p in products]
-    })
+    return app.response_class(
+        b'{"products":' + json_array(encode_product_rows(FEATURED_PRODUCT_FIELDS, rows, generation)) + b'}',
+        mimetype='application/json'
+    )
 
 @app.route('/api/products/<int:product_id>', methods=['GET'])
+@catalog_cached
 def get_product(product_id):
     """Get single product by ID"""
-    product = Product.query.get(product_id)
+    product = catalog_products_query().filter(Product.id == product_id).first()
     
     if not product:
         return jsonify({'error': 'Product not found'}), 404
     
+    return jsonify({'product': product_detail(product)})
+
+@app.route('/api/products/lookup', methods=['GET'])
+@catalog_cached
+def lookup_product():
+    """Get single product by exact name (uses the unique index on Product.name)"""
+    name = request.args.get('name')
+    
+    if not name:
+        return jsonify({'error': 'Product name is required'}), 400
+    
+    product = catalog_products_query().filter(Product.name == name).first()
+    
+    if not product:
+        return jsonify({'error': 'Product not found'}), 404
+    
+    return jsonify({'product': product_detail(product)})
+
+def search_match_expression(text):
+    """FTS5 MATCH expression for free text: every word must match, the last one as a prefix.
+    
+    Words are quoted, so FTS5 operators typed by users are matched literally.
+    """
+    terms = SEARCH_TERM.findall(text)[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+# FTS5 wraps matches in these control characters; highlight_html swaps them for <mark> after escaping
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+
+def highlight_html(text):
+    """HTML-escape FTS5 highlight()/snippet() output and mark its matches with <mark>"""
+    if text is None:
+        return None
+    return html.escape(text).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+def search_tiers(match):
+    """MATCH expressions for products whose name has every word, then every other match"""
+    in_name = f'{{name}} : ({match})'
+    return [in_name, f'({match}) NOT {in_name}']
+
+# Capped counts of the whole match and, only when it is over the cap, of each tier
+SEARCH_COUNT_QUERY = db.text(
+    "SELECT total,"
+    " CASE WHEN total >= :cap THEN (SELECT count(*) FROM"
+    "  (SELECT 1 FROM product_search WHERE product_search MATCH :in_name LIMIT :name_cap)) END,"
+    " CASE WHEN total >= :cap THEN (SELECT count(*) FROM"
+    "  (SELECT 1 FROM product_search WHERE product_search MATCH :elsewhere LIMIT :cap)) END"
+    " FROM (SELECT count(*) AS total FROM"
+    "  (SELECT 1 FROM product_search WHERE product_search MATCH :match LIMIT :cap))"
+)
+
+def product_search_query(order):
+    """A page of matches with highlighted name and snippet, in the given order"""
+    return db.text(
+        "SELECT product.id, product.name, product.price, product.image_url, product.stock,"
+        "  collection.name AS collection,"
+        "  highlight(product_search, 0, char(2), char(3)) AS name_highlight,"
+        "  snippet(product_search, -1, char(2), char(3), '…', 12) AS snippet"
+        " FROM product_search"
+        " JOIN product ON product.id = product_search.rowid"
+        " LEFT JOIN collection ON collection.id = product.collection_id"
+        " WHERE product_search MATCH :match"
+        f" ORDER BY {order}"
+        " LIMIT :limit OFFSET :offset"
+    )
+
+SEARCH_BY_RANK = product_search_query('product_search.rank')
+SEARCH_BY_NEWEST = product_search_query('product_search.rowid DESC')  # Walks the index, no scoring
+
+@app.route('/api/products/search', methods=['GET'])
+@catalog_cached
+def search_products():
+    """Full-text product search over name, description, details and collection.
+    
+    When at most SEARCH_RANK_CANDIDATES products match, they are all ranked
+    by bm25. Broader queries list products whose name has every word first,
+    then the other matches; each of those two groups is ranked by bm25 when
+    it is small enough and newest first otherwise. Every match can be
+    reached by paging either way.
+    """
+    match = search_match_expression(request.args.get('q', ''))
+    if match is None:
+        return jsonify({'error': 'Search text is required'}), 400
+    
+    limit = max(1, min(request.args.get('limit', type=int) or DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    in_name, elsewhere = search_tiers(match)
+    end = offset + limit
+    total, name_count, elsewhere_count = db.session.execute(SEARCH_COUNT_QUERY, {
+        'match': match, 'in_name': in_name, 'elsewhere': elsewhere,
+        'cap': SEARCH_RANK_CANDIDATES + 1, 'name_cap': max(SEARCH_RANK_CANDIDATES, end) + 1,
+    }).one()
+    
+    if total <= SEARCH_RANK_CANDIDATES:
+        rows = db.session.execute(SEARCH_BY_RANK, {'match': match, 'limit': limit + 1, 'offset': offset}).all()
+    else:
+        # name_count is exact whenever the page reaches past the name tier
+        rows = []
+        for tier_match, count, start in ((in_name, name_count, 0), (elsewhere, elsewhere_count, name_count)):
+            position = offset + len(rows)
+            if position >= start + count and count <= SEARCH_RANK_CANDIDATES:
+                continue  # Page starts after this tier
+            query = SEARCH_BY_RANK if count <= SEARCH_RANK_CANDIDATES else SEARCH_BY_NEWEST
+            rows += db.session.execute(query, {
+                'match': tier_match, 'limit': limit + 1 - len(rows), 'offset': position - start
+            }).all()
+            if len(rows) > limit:
+                break
+    
+    products = []
+    for row in rows[:limit]:
+        product = dict(row._mapping)
+        product['name_highlight'] = highlight_html(product['name_highlight'])
+        product['snippet'] = highlight_html(product['snippet'])
+        products.append(product)
+    
     return jsonify({
-        'product': {
-            'id': product.id,
-            'name': product.name,
-            'description': product.description,
-            'details': product.details,
-            'price': product.price,
-            'image_url': product.image_url,
-            'collection': product.collection.name if product.collection else None,
-            'stock': product.stock,
-            'is_featured': product.is_featured
-        }
+        'products': products,
+        'next_offset': end if len(rows) > limit else None  # One extra row tells us there is a next page
     })
 
+# =============== SESSION TOKENS ===============
+token_serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='fara3-auth')
+
+def issue_token(user_id):
+    """Signed, timestamped token carrying the user id"""
+    return token_serializer.dumps({'uid': user_id})
+
+@lru_cache(maxsize=4096)
+def decode_token(token):
+    """(user_id, issued_at) of a token whose signature checks out.
+    
+    Memoized so hot sessions skip the HMAC; bad signatures raise and are
+    never cached. Expiry is checked by verify_token on every call.
+    """
+    payload, issued_at = token_serializer.loads(token, return_timestamp=True)
+    return payload['uid'], issued_at.timestamp()
+
+def verify_token(token):
+    """User id for a valid, unexpired token, otherwise None"""
+    try:
+        user_id, issued_at = decode_token(token)
+    except (BadSignature, KeyError, TypeError):
+        return None
+    if time.time() - issued_at > app.config['AUTH_TOKEN_MAX_AGE']:
+        return None
+    return user_id
+
+def auth_required(view):
+    """Authenticate from 'Authorization: Bearer <token>' into g.user_id, without touching the database"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        user_id = verify_token(token.strip())
+        if user_id is None:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+        
+        g.user_id = user_id
+        return view(*args, **kwargs)
+    return wrapper
+
+def is_other_user(claimed_user_id):
+    """True when a request names a user_id other than the authenticated one"""
+    return claimed_user_id is not None and str(claimed_user_id) != str(g.user_id)
+
 # =============== AUTHENTICATION API ===============
+password_pool = HashingPool(app.config['PASSWORD_HASH_WORKERS'], app.config['PASSWORD_HASH_MAX_PENDING'])
+
+@app.errorhandler(HashingPoolBusy)
+def password_pool_busy(error):
+    response = jsonify({'error': 'Too many sign-ins right now, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -382,6 +1323,8 @@ def register():
         # Validate required fields
         if not data.get('name') or not data.get('email') or not data.get('password'):
             return jsonify({'error': 'Name, email, and password are required'}), 400
+        if not all(isinstance(data[field], str) for field in ('name', 'email', 'password')):
+            return jsonify({'error': 'Name, email, and password must be strings'}), 400
         
         # Check if user already exists
         existing_user = User.query.filter_by(email=data['email']).first()
@@ -392,7 +1335,7 @@ def register():
         new_user = User(
             name=data['name'],
             email=data['email'],
-            password=data['password']  # In production: hash this password!
+            password=password_pool.hash(data['password'])
         )
         
         db.session.add(new_user)
@@ -408,6 +1351,8 @@ def register():
             }
         }), 201
         
+    except HashingPoolBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -420,19 +1365,32 @@ def login():
         
         if not data.get('email') or not data.get('password'):
             return jsonify({'error': 'Email and password are required'}), 400
+        if not isinstance(data['email'], str) or not isinstance(data['password'], str):
+            return jsonify({'error': 'Email and password must be strings'}), 400
         
         # Find user
         user = User.query.filter_by(email=data['email']).first()
         
-        if not user or user.password != data['password']:  # In production: use password hashing
+        # Unknown emails pay for a hash check too, so timing doesn't tell which accounts exist
+        password_ok = password_pool.verify(data['password'], user.password if user else dummy_hash())
+        if not user or not password_ok:
             return jsonify({'error': 'Invalid email or password'}), 401
         
         # Check if user is active
         if not user.is_active:
             return jsonify({'error': 'Account is deactivated'}), 403
         
+        # Upgrade plaintext or outdated hashes now that we know the password
+        if needs_rehash(user.password):
+            try:
+                user.password = password_pool.hash(data['password'])
+                db.session.commit()
+            except HashingPoolBusy:
+                pass  # Try again on a later login
+        
         return jsonify({
             'message': 'Login successful',
+            'token': issue_token(user.id),
             'user': {
                 'id': user.id,
                 'name': user.name,
@@ -441,65 +1399,108 @@ def login():
             }
         })
         
+    except HashingPoolBusy:
+        raise
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 # =============== CART API ===============
+MAX_CART_OPERATIONS = 100
+
+def cart_payload(user_id):
+    """Cart items and total from one joined SELECT; subtotals are computed by SQLite"""
+    rows = db.session.query(
+        CartItem.id,
+        CartItem.product_id,
+        Product.name,
+        Product.price,
+        Product.image_url,
+        CartItem.quantity,
+        (CartItem.quantity * Product.price).label('subtotal')
+    ).join(Product, CartItem.product_id == Product.id) \
+        .filter(CartItem.user_id == user_id) \
+        .order_by(CartItem.id) \
+        .all()
+    
+    cart_items = []
+    total = 0
+    for row in rows:
+        cart_items.append({
+            'id': row.id,
+            'product_id': row.product_id,
+            'product_name': row.name,
+            'product_price': row.price,
+            'product_image': row.image_url,
+            'quantity': row.quantity,
+            'subtotal': row.subtotal
+        })
+        total += row.subtotal
+    
+    return {
+        'cart_items': cart_items,
+        'total': total
+    }
+
+def apply_cart_deltas(user_id, deltas):
+    """Add {product_id: quantity_delta} to a cart with one INSERT ... ON CONFLICT DO UPDATE.
+    
+    Relies on the unique (user_id, product_id) cart index. Rows whose
+    quantity drops to zero or below are removed afterwards.
+    """
+    now = datetime.utcnow()
+    statement = sqlite_insert(CartItem).values([{
+        'user_id': user_id,
+        'product_id': product_id,
+        'quantity': delta,
+        'added_at': now
+    } for product_id, delta in deltas.items()])
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'product_id'],
+        set_={'quantity': CartItem.quantity + statement.excluded.quantity}
+    )
+    db.session.execute(statement)
+    
+    if any(delta < 0 for delta in deltas.values()):
+        CartItem.query.filter(CartItem.user_id == user_id, CartItem.quantity <= 0) \
+            .delete(synchronize_session=False)
+
 @app.route('/api/cart', methods=['GET'])
+@auth_required
 def get_cart():
     """Get user's cart items"""
-    user_id = request.args.get('user_id')
+    if is_other_user(request.args.get('user_id')):
+        return jsonify({'error': 'Not allowed to access this cart'}), 403
     
-    if not user_id:
-        return jsonify({'error': 'User ID is required'}), 400
-    
-    cart_items = CartItem.query.filter_by(user_id=user_id).all()
-    
-    return jsonify({
-        'cart_items': [{
-            'id': item.id,
-            'product_id': item.product_id,
-            'product_name': item.product.name,
-            'product_price': item.product.price,
-            'product_image': item.product.image_url,
-            'quantity': item.quantity,
-            'subtotal': item.quantity * item.product.price
-        } for item in cart_items],
-        'total': sum(item.quantity * item.product.price for item in cart_items)
-    })
+    return jsonify(cart_payload(g.user_id))
 
 @app.route('/api/cart', methods=['POST'])
+@auth_required
 def add_to_cart():
     """Add item to cart"""
     try:
         data = request.json
         
-        if not data.get('user_id') or not data.get('product_id'):
-            return jsonify({'error': 'User ID and Product ID are required'}), 400
+        if not data.get('product_id'):
+            return jsonify({'error': 'Product ID is required'}), 400
+        
+        if is_other_user(data.get('user_id')):
+            return jsonify({'error': 'Not allowed to access this cart'}), 403
+        
+        try:
+            quantity = int(data.get('quantity', 1))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Quantity must be a number'}), 400
+        if quantity < 1:
+            return jsonify({'error': 'Quantity must be at least 1'}), 400
         
         # Check if product exists
-        product = Product.query.get(data['product_id'])
+        product = db.session.get(Product, data['product_id'])
         if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        # Check if item already in cart
-        existing_item = CartItem.query.filter_by(
-            user_id=data['user_id'],
-            product_id=data['product_id']
-        ).first()
-        
-        if existing_item:
-            # Update quantity
-            existing_item.quantity += data.get('quantity', 1)
-        else:
-            # Create new cart item
-            new_item = CartItem(
-                user_id=data['user_id'],
-                product_id=data['product_id'],
-                quantity=data.get('quantity', 1)
-            )
-            db.session.add(new_item)
-        
+        # Insert or bump the quantity of an existing row in one statement
+        apply_cart_deltas(g.user_id, {product.id: quantity})
         db.session.commit()
         
         return jsonify({'message': 'Item added to cart successfully'}), 201
@@ -508,11 +1509,78 @@ def add_to_cart():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cart', methods=['PATCH'])
+@auth_required
+def update_cart():
+    """Apply a batch of {product_id or product_name, quantity_delta} operations in one transaction.
+    
+    Operations naming a product that does not exist are skipped and listed
+    in unknown_products, so a local cart with items the catalog lacks still
+    syncs the rest. An unknown product_id is a client bug and fails with 404.
+    """
+    try:
+        data = request.json
+        operations = data.get('operations')
+        
+        if not isinstance(operations, list) or not operations:
+            return jsonify({'error': 'Operations are required'}), 400
+        
+        if is_other_user(data.get('user_id')):
+            return jsonify({'error': 'Not allowed to access this cart'}), 403
+        
+        if len(operations) > MAX_CART_OPERATIONS:
+            return jsonify({'error': f'At most {MAX_CART_OPERATIONS} operations per request'}), 400
+        
+        deltas_by_id = {}
+        deltas_by_name = {}
+        for operation in operations:
+            try:
+                delta = int(operation.get('quantity_delta', 0))
+                if operation.get('product_id') is not None:
+                    product_id = int(operation['product_id'])
+                    deltas_by_id[product_id] = deltas_by_id.get(product_id, 0) + delta
+                elif operation.get('product_name'):
+                    name = operation['product_name']
+                    deltas_by_name[name] = deltas_by_name.get(name, 0) + delta
+                else:
+                    raise ValueError
+            except (AttributeError, TypeError, ValueError):
+                return jsonify({'error': 'Each operation needs a product_id or product_name and a numeric quantity_delta'}), 400
+        
+        # Resolve names and confirm every product exists in one query
+        products = db.session.query(Product.id, Product.name) \
+            .filter(db.or_(Product.id.in_(deltas_by_id), Product.name.in_(deltas_by_name))) \
+            .all()
+        ids_by_name = {product.name: product.id for product in products}
+        found_ids = {product.id for product in products}
+        missing = [str(product_id) for product_id in deltas_by_id if product_id not in found_ids]
+        if missing:
+            return jsonify({'error': f"Product(s) not found: {', '.join(missing)}"}), 404
+        unknown_names = [name for name in deltas_by_name if name not in ids_by_name]
+        
+        deltas = dict(deltas_by_id)
+        for name, delta in deltas_by_name.items():
+            if name in ids_by_name:
+                deltas[ids_by_name[name]] = deltas.get(ids_by_name[name], 0) + delta
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+        
+        if deltas:
+            apply_cart_deltas(g.user_id, deltas)
+            db.session.commit()
+        
+        return jsonify({'message': 'Cart updated successfully', 'unknown_products': unknown_names,
+                        **cart_payload(g.user_id)})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/cart/<int:item_id>', methods=['DELETE'])
+@auth_required
 def remove_from_cart(item_id):
     """Remove item from cart"""
     try:
-        cart_item = CartItem.query.get(item_id)
+        cart_item = CartItem.query.filter_by(id=item_id, user_id=g.user_id).first()
         
         if not cart_item:
             return jsonify({'error': 'Cart item not found'}), 404
@@ -527,8 +1595,12 @@ def remove_from_cart(item_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/cart/clear/<int:user_id>', methods=['DELETE'])
+@auth_required
 def clear_cart(user_id):
     """Clear user's cart"""
+    if is_other_user(user_id):
+        return jsonify({'error': 'Not allowed to access this cart'}), 403
+    
     try:
         CartItem.query.filter_by(user_id=user_id).delete()
         db.session.commit()
@@ -540,39 +1612,128 @@ def clear_cart(user_id):
         return jsonify({'error': str(e)}), 500
 
 # =============== ORDERS API ===============
+ORDER_NUMBER_BLOCK_SIZE = 1000
+DEFAULT_ORDER_PAGE_SIZE = 20
+MAX_ORDER_PAGE_SIZE = 100
+
+class OrderNumberGenerator:
+    """Collision-free order numbers: FA + YYYYMMDD + a 10-digit global sequence.
+    
+    Each process leases blocks of sequence values from the order_sequence
+    table in a short transaction of its own, so the database is touched
+    once per block and two processes can never hand out the same number.
+    Because the lease uses a separate connection, call it before the
+    request's own transaction starts writing or the two will wait on
+    each other for SQLite's write lock.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _lease_block(self):
+        table = OrderSequence.__table__
+        # The UPDATE takes SQLite's write lock, so concurrent leases queue up here
+        with db.engine.begin() as connection:
+            updated = connection.execute(
+                table.update().where(table.c.id == 1).values(next_value=table.c.next_value + self.block_size)
+            ).rowcount
+            if updated:
+                end = connection.execute(db.select(table.c.next_value).where(table.c.id == 1)).scalar()
+            else:
+                end = 1 + self.block_size
+                connection.execute(table.insert().values(id=1, next_value=end))
+        self._next, self._end = end - self.block_size, end
+
+    def next_sequence(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._lease_block()
+            value = self._next
+            self._next += 1
+            return value
+
+    def __call__(self):
+        return f"FA{datetime.now():%Y%m%d}{self.next_sequence():010d}"
+
+generate_order_number = OrderNumberGenerator(ORDER_NUMBER_BLOCK_SIZE)
+
+def reserve_stock(quantities):
+    """Atomically take {product_id: quantity} out of stock in the current transaction.
+    
+    A single conditional CASE UPDATE only touches products that still have
+    enough stock, so concurrent checkouts can never oversell. Returns None
+    when every product was reserved. Otherwise the partial reservation is
+    rolled back and the name of a product that ran short is returned.
+    """
+    requested = db.case(quantities, value=Product.id)
+    result = db.session.execute(
+        db.update(Product)
+        .where(Product.id.in_(quantities), Product.stock >= requested)
+        .values(stock=Product.stock - requested)
+        .execution_options(synchronize_session=False, product_ids=list(quantities))
+    )
+    if result.rowcount == len(quantities):
+        return None
+    
+    db.session.rollback()
+    short_product = db.session.query(Product.name) \
+        .filter(Product.id.in_(quantities), Product.stock < requested) \
+        .first()
+    return short_product.name if short_product else 'an item in your basket'
+
 @app.route('/api/orders', methods=['POST'])
+@auth_required
 def create_order():
     """Create a new order"""
     try:
         data = request.json
         
-        if not data.get('user_id') or not data.get('items'):
-            return jsonify({'error': 'User ID and items are required'}), 400
+        if not data.get('items'):
+            return jsonify({'error': 'Items are required'}), 400
         
-        # Calculate total
-        total_amount = 0
-        order_items = []
+        if is_other_user(data.get('user_id')):
+            return jsonify({'error': 'Not allowed to order for another user'}), 403
         
+        # Merge repeated lines for the same product, keeping basket order
+        quantities = {}
         for item in data['items']:
-            product = Product.query.get(item['product_id'])
+            try:
+                product_id = int(item['product_id'])
+                quantity = int(item.get('quantity', 1))
+            except (KeyError, TypeError, ValueError):
+                return jsonify({'error': 'Each item needs a numeric product_id and quantity'}), 400
+            if quantity < 1:
+                return jsonify({'error': 'Quantity must be at least 1'}), 400
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        
+        # One IN query for the whole basket
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(quantities)).all()}
+        
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
             if not product:
-                return jsonify({'error': f"Product {item['product_id']} not found"}), 404
+                return jsonify({'error': f"Product {product_id} not found"}), 404
             
-            if product.stock < item.get('quantity', 1):
+            # Fast fail without taking the write lock; reserve_stock has the final word
+            if product.stock < quantity:
                 return jsonify({'error': f"Insufficient stock for {product.name}"}), 400
-            
-            total_amount += product.price * item.get('quantity', 1)
-            order_items.append({
-                'product': product,
-                'quantity': item.get('quantity', 1)
-            })
         
-        # Generate order number
-        order_number = f"FA{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        # Generate order number before this transaction takes the write lock (see OrderNumberGenerator)
+        order_number = generate_order_number()
+        
+        short_product = reserve_stock(quantities)
+        if short_product:
+            return jsonify({'error': f"Insufficient stock for {short_product}"}), 400
+        
+        # Calculate total
+        total_amount = sum(products[product_id].price * quantity for product_id, quantity in quantities.items())
         
         # Create order
         new_order = Order(
-            user_id=data['user_id'],
+            user_id=g.user_id,
             order_number=order_number,
             total_amount=total_amount,
             payment_method=data.get('payment_method', 'cod'),
@@ -583,23 +1744,18 @@ def create_order():
         db.session.add(new_order)
         db.session.flush()  # Get the order ID
         
-        # Create order items
-        for item_data in order_items:
-            order_item = OrderItem(
-                order_id=new_order.id,
-                product_id=item_data['product'].id,
-                product_name=item_data['product'].name,
-                quantity=item_data['quantity'],
-                price=item_data['product'].price,
-                image_url=item_data['product'].image_url
-            )
-            db.session.add(order_item)
-            
-            # Update product stock
-            item_data['product'].stock -= item_data['quantity']
+        # Create order items in a single executemany INSERT
+        db.session.execute(db.insert(OrderItem), [{
+            'order_id': new_order.id,
+            'product_id': product_id,
+            'product_name': products[product_id].name,
+            'quantity': quantity,
+            'price': products[product_id].price,
+            'image_url': products[product_id].image_url
+        } for product_id, quantity in quantities.items()])
         
         # Clear user's cart
-        CartItem.query.filter_by(user_id=data['user_id']).delete()
+        CartItem.query.filter_by(user_id=g.user_id).delete()
         
         db.session.commit()
         
@@ -619,52 +1775,444 @@ def create_order():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/orders/user/<int:user_id>', methods=['GET'])
+@auth_required
 def get_user_orders(user_id):
-    """Get all orders for a user"""
-    orders = Order.query.filter_by(user_id=user_id).order_by(Order.order_date.desc()).all()
+    """Get a user's orders newest first, paginated by cursor.
     
-    return jsonify({
-        'orders': [{
+    ?summary=true replaces the line items with item/unit counts computed
+    by SQLite; otherwise the page's items are loaded with one IN query.
+    """
+    if is_other_user(user_id):
+        return jsonify({'error': "Not allowed to access this user's orders"}), 403
+    
+    cursor = request.args.get('cursor')
+    summary = request.args.get('summary', '').lower() == 'true'
+    limit = request.args.get('limit', type=int) or DEFAULT_ORDER_PAGE_SIZE
+    limit = max(1, min(limit, MAX_ORDER_PAGE_SIZE))
+    
+    if summary:
+        item_count = db.select(db.func.count(OrderItem.id)) \
+            .where(OrderItem.order_id == Order.id).scalar_subquery()
+        unit_count = db.select(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)) \
+            .where(OrderItem.order_id == Order.id).scalar_subquery()
+        query = db.session.query(Order, item_count.label('item_count'), unit_count.label('unit_count'))
+    else:
+        query = Order.query.options(db.selectinload(Order.items))
+    
+    query = query.filter(Order.user_id == user_id)
+    if cursor:
+        try:
+            before = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.tuple_(Order.order_date, Order.id) < db.tuple_(*before))
+    
+    # One extra row tells us whether there is a next page
+    rows = query.order_by(Order.order_date.desc(), Order.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    
+    orders = []
+    for row in page:
+        order = row[0] if summary else row
+        payload = {
             'id': order.id,
             'order_number': order.order_number,
             'order_date': order.order_date.isoformat(),
             'total_amount': order.total_amount,
             'payment_method': order.payment_method,
-            'status': order.status,
-            'items': [{
+            'status': order.status
+        }
+        if summary:
+            payload['item_count'] = row.item_count
+            payload['unit_count'] = row.unit_count
+        else:
+            payload['items'] = [{
                 'product_name': item.product_name,
                 'quantity': item.quantity,
                 'price': item.price,
                 'image_url': item.image_url
             } for item in order.items]
-        } for order in orders]
+        orders.append(payload)
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1][0] if summary else page[-1]
+        next_cursor = encode_cursor(last.order_date, last.id)
+    
+    return jsonify({
+        'orders': orders,
+        'next_cursor': next_cursor
     })
 
+# =============== WRITE-BEHIND QUEUE ===============
+class WriteBehindFull(Exception):
+    """Raised when the write-behind queue is at capacity"""
+
+class WriteBehindQueue:
+    """Bounded queue of non-critical INSERTs, flushed in batches by a background thread.
+    
+    A batch is written in one transaction as soon as batch_size rows are
+    waiting or interval seconds after its first row arrived, so bursts
+    of form posts take SQLite's write lock a few times instead of once
+    per row. The flusher starts on first use; drain() writes whatever is
+    still queued and stops it.
+    """
+
+    def __init__(self, max_pending, batch_size, interval):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, model, values):
+        """Queue one row for model, raising WriteBehindFull instead of blocking"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((model, values))
+        except queue.Full:
+            raise WriteBehindFull() from None
+
+    def join(self):
+        """Block until every row submitted so far has been flushed"""
+        self._queue.join()
+
+    def drain(self, timeout=None):
+        """Flush everything still queued and stop the flusher"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='fara3-write-behind', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+    def _take_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            # While draining, take what is there without waiting for more
+            remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        rows_by_model = {}
+        for model, values in batch:
+            rows_by_model.setdefault(model, []).append(values)
+        
+        with app.app_context():
+            try:
+                for model, rows in rows_by_model.items():
+                    db.session.execute(db.insert(model), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Write-behind batch of %d rows failed, retrying row by row", len(batch))
+                self._flush_rows(batch)
+        
+        for _ in batch:
+            self._queue.task_done()
+
+    def _flush_rows(self, batch):
+        """Insert a failed batch one row per transaction, so one bad row only loses itself"""
+        for model, values in batch:
+            try:
+                db.session.execute(db.insert(model), [values])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Write-behind row for %s dropped", model.__tablename__)
+
+write_behind = WriteBehindQueue(
+    app.config['WRITE_BEHIND_MAX_PENDING'],
+    app.config['WRITE_BEHIND_BATCH_SIZE'],
+    app.config['WRITE_BEHIND_INTERVAL']
+)
+atexit.register(write_behind.drain)
+
 # =============== CONTACT API ===============
 @app.route('/api/contact', methods=['POST'])
 def submit_contact():
-    """Submit contact form"""
+    """Submit contact form (stored asynchronously by write_behind)"""
     try:
         data = request.json
         
         if not data.get('name') or not data.get('email') or not data.get('message'):
             return jsonify({'error': 'Name, email, and message are required'}), 400
+        # Checked here because the row is only written later, after the 202
+        if not all(isinstance(data[field], str) for field in ('name', 'email', 'message')):
+            return jsonify({'error': 'Name, email, and message must be strings'}), 400
         
-        new_message = ContactMessage(
-            name=data['name'],
-            email=data['email'],
-            message=data['message']
-        )
-        
-        db.session.add(new_message)
-        db.session.commit()
+        write_behind.submit(ContactMessage, {
+            'name': data['name'],
+            'email': data['email'],
+            'message': data['message'],
+            'submitted_at': datetime.utcnow(),
+            'is_read': False
+        })
         
-        return jsonify({'message': 'Message sent successfully'}), 201
+        return jsonify({'message': 'Message sent successfully'}), 202
         
+    except WriteBehindFull:
+        response = jsonify({'error': 'Too many messages right now, please retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 429
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# =============== STATIC ASSETS ===============
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSET_EXTENSIONS = {'.html', '.css', '.js', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico'}
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+def file_digest(path):
+    """Short SHA-256 of a file's contents, read in 1 MiB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as asset_file:
+        for chunk in iter(lambda: asset_file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+@lru_cache(maxsize=None)
+def asset_digests():
+    """{file name: content digest} for every servable file next to app1.py, hashed once per process"""
+    return {
+        entry.name: file_digest(entry.path)
+        for entry in sorted(os.scandir(ASSET_DIR), key=lambda entry: entry.name)
+        if entry.is_file() and os.path.splitext(entry.name)[1].lower() in ASSET_EXTENSIONS
+    }
+
+def hashed_asset_name(name, digest):
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{digest}{extension}"
+
+@lru_cache(maxsize=None)
+def asset_manifest():
+    """{file name: content-hashed name under /assets/}, the map web1.js rewrites image URLs with"""
+    return {name: hashed_asset_name(name, digest) for name, digest in asset_digests().items()}
+
+@lru_cache(maxsize=None)
+def hashed_assets():
+    """Inverse of asset_manifest: {content-hashed name: file name}"""
+    return {hashed: name for name, hashed in asset_manifest().items()}
+
+@app.route('/assets/manifest.json', methods=['GET'])
+def get_asset_manifest():
+    """Asset manifest, revalidated on every use since it changes with each deploy"""
+    response = jsonify(asset_manifest())
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/assets/<path:filename>', methods=['GET'])
+def get_asset(filename):
+    """Serve a static file by content-hashed name (cached forever) or plain name (revalidated).
+    
+    send_from_directory answers If-None-Match and Range requests itself
+    and hands the open file to the server's wsgi.file_wrapper.
+    """
+    name = hashed_assets().get(filename)
+    immutable = name is not None
+    if not immutable:
+        name = filename
+    digest = asset_digests().get(name)
+    if digest is None:
+        return jsonify({'error': 'Asset not found'}), 404
+    
+    response = send_from_directory(ASSET_DIR, name, etag=digest, max_age=ASSET_MAX_AGE if immutable else 0)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable' if immutable else 'no-cache'
+    return response
+
+# =============== IMAGE VARIANTS ===============
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+DEFAULT_IMAGE_FORMAT = 'webp'
+PREGENERATED_IMAGE_WIDTHS = (160, 640)  # Cart/order thumbnails and collection cards
+
+image_variants = images.VariantCache(app.config['IMAGE_CACHE_DIR'], app.config['IMAGE_CACHE_MAX_BYTES'])
+
+def image_variant_path(name, width, fmt):
+    """Rendered (or cached) variant of the asset called name, None if it isn't a local image"""
+    digest = asset_digests().get(name)
+    if digest is None or os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+        return None
+    return image_variants.path(os.path.join(ASSET_DIR, name), digest, images.variant_width(width), fmt)
+
+@app.route('/img/<path:filename>', methods=['GET'])
+def get_image_variant(filename):
+    """Resized copy of a storefront image: /img/<plain or hashed name>?w=<width>&fmt=webp|jpeg|png.
+    
+    Widths round up to images.VARIANT_WIDTHS and images are never scaled
+    up. Without Pillow the original file is served instead, and sources
+    past Pillow's decompression bomb limit get a 422.
+    """
+    name = hashed_assets().get(filename)
+    immutable = name is not None
+    if not immutable:
+        name = filename
+    if name not in asset_digests() or os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    fmt = request.args.get('fmt', DEFAULT_IMAGE_FORMAT)
+    if fmt not in images.FORMATS:
+        return jsonify({'error': f"fmt must be one of: {', '.join(images.FORMATS)}"}), 400
+    if not images.available:
+        return get_asset(filename)
+    
+    try:
+        path = image_variant_path(name, request.args.get('w', type=int), fmt)
+    except images.Image.DecompressionBombError:
+        app.logger.warning("Refused to resize %s: too many pixels", name)
+        return jsonify({'error': 'Image is too large to resize'}), 422
+    except OSError:
+        app.logger.exception("Could not render a variant of %s", name)
+        return get_asset(filename)
+    
+    response = send_file(path, mimetype=images.FORMATS[fmt][2], etag=os.path.basename(path),
+                         max_age=ASSET_MAX_AGE if immutable else 0)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable' if immutable else 'no-cache'
+    return response
+
+@app.cli.command('pregenerate-images')
+def pregenerate_images():
+    """Render every /img variant the catalog's Product and Collection images use"""
+    if not images.available:
+        print("⚠️ Pillow is not installed; /img serves original files and there is nothing to render.")
+        return
+    
+    names = {url for (url,) in db.session.query(Product.image_url).union(db.session.query(Collection.image_url))}
+    names = sorted(name for name in names if name in asset_digests())
+    jobs = [(name, width, fmt) for name in names
+            for width in PREGENERATED_IMAGE_WIDTHS for fmt in (DEFAULT_IMAGE_FORMAT, 'jpeg')]
+    
+    started = time.perf_counter()
+    rendered_before = image_variants.renders
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:  # Pillow releases the GIL while resizing
+        list(pool.map(lambda job: image_variant_path(*job), jobs))
+    print(f"🖼️ {len(jobs)} variants of {len(names)} images ready, {image_variants.renders - rendered_before} "
+          f"rendered in {time.perf_counter() - started:.1f}s")
+
+# =============== RESPONSE COMPRESSION ===============
+try:
+    import brotli  # Optional, adds 'br' to the negotiable encodings
+except ImportError:
+    brotli = None
+
+COMPRESSORS = {
+    'gzip': lambda body: gzip.compress(body, compresslevel=app.config['COMPRESSION_LEVEL'], mtime=0),
+    'deflate': lambda body: zlib.compress(body, app.config['COMPRESSION_LEVEL']),
+}
+if brotli is not None:
+    COMPRESSORS = {'br': lambda body: brotli.compress(body, quality=5), **COMPRESSORS}
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+def negotiate_encoding(accept_encoding):
+    """Best of COMPRESSORS the client accepts, preferring earlier entries on equal q; None for identity"""
+    accepted = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in COMPRESSORS:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def is_compressible(headers):
+    mimetype = headers.get('Content-Type', '').split(';')[0].strip()
+    return (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES) \
+        and 'Content-Encoding' not in headers \
+        and 'no-transform' not in headers.get('Cache-Control', '')
+
+class CompressionMiddleware:
+    """WSGI middleware compressing text and JSON responses as negotiated by Accept-Encoding.
+    
+    Only 200 responses of at least min_bytes are compressed. When a
+    response has an ETag its compressed body is kept in cache under
+    (path, sorted query args, ETag, encoding), so each catalog version or
+    asset is compressed once and then served many times, and a body can
+    never be served for a URL it didn't come from. Compressed responses carry the weak form
+    of the ETag, since their bytes differ from the identity body.
+    """
+
+    def __init__(self, wsgi_app, min_bytes, cache):
+        self.wsgi_app = wsgi_app
+        self.min_bytes = min_bytes
+        self.cache = cache
+
+    def __call__(self, environ, start_response):
+        captured = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        app_iter = self.wsgi_app(environ, capture)
+        status, header_list, exc_info = captured
+        headers = Headers(header_list)
+
+        def pass_through():
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            if written:
+                return ClosingIterator(chain(written, app_iter), getattr(app_iter, 'close', None))
+            return app_iter  # Untouched, so wsgi.file_wrapper responses keep their fast path
+        
+        if not is_compressible(headers):
+            return pass_through()
+        
+        headers.add('Vary', 'Accept-Encoding')
+        encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        length = headers.get('Content-Length', type=int)
+        if encoding is None or not status.startswith('200') or environ['REQUEST_METHOD'] == 'HEAD' \
+                or (length is not None and length < self.min_bytes):
+            return pass_through()
+        
+        try:
+            body = b''.join(chain(written, app_iter))
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        if len(body) < self.min_bytes:
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return [body]
+        
+        etag = headers.get('ETag')
+        key = (environ.get('PATH_INFO', ''), tuple(sorted(parse_qsl(environ.get('QUERY_STRING', ''), keep_blank_values=True))),
+               etag, encoding)
+        compressed = self.cache.get(key) if etag else None
+        if compressed is None:
+            compressed = COMPRESSORS[encoding](body)
+            if etag:
+                self.cache.put(key, self.cache.version, compressed)
+        
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(len(compressed))
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = 'W/' + etag
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return [compressed]
+
+# Entries are keyed by URL and ETag, so they never go stale and just age out of the LRU
+compressed_cache = CatalogCache(app.config['COMPRESSION_CACHE_MAX_BYTES'])
+app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config['COMPRESSION_MIN_BYTES'], compressed_cache)
+
 # =============== ERROR HANDLERS ===============
 @app.errorhandler(404)
 def not_found(error):
@@ -682,18 +2230,25 @@ if __name__ == '__main__':
     
     # Initialize database with sample data
     initialize_database()
+    print(f"🗂️ Hashed {len(asset_manifest())} static assets")
     
     print("\n📋 Available API Endpoints:")
     print("   GET  /                            - API Status")
     print("   GET  /api/collections             - All collections")
-    print("   GET  /api/products                - All products")
+    print("   GET  /api/products?cursor=&limit= - Products (paginated)")
     print("   GET  /api/products/featured       - Featured products")
+    print("   GET  /api/products/lookup?name=X  - Product by name")
+    print("   GET  /api/products?ids=1,2,3      - Products by id")
+    print("   GET  /api/products/search?q=X     - Full-text product search")
     print("   POST /api/auth/register           - Register user")
     print("   POST /api/auth/login              - Login user")
-    print("   GET  /api/cart?user_id=X          - Get cart")
+    print("   GET  /api/cart                    - Get cart (Bearer token)")
     print("   POST /api/cart                    - Add to cart")
+    print("   PATCH /api/cart                   - Batch cart update")
     print("   POST /api/orders                  - Create order")
     print("   POST /api/contact                 - Submit contact")
+    print("   GET  /assets/manifest.json        - Content-hashed asset URLs")
+    print("   GET  /img/<name>?w=320&fmt=webp    - Resized image variant")
     print("\n🌐 Server running at: http://127.0.0.1:5000")
     print("=" * 60)
     
@@ -0,0 +1,1380 @@
+"""Benchmarks and budget checks for the 𝐹𝒶𝓇𝒶`𝟥 backend.
+
+Runs against a throwaway SQLite database so the real instance/fara3.db is
+never touched. Every command exits non-zero when a budget is exceeded.
+
+Usage:
+    python bench_fara3.py queries       - SQL statement budget per endpoint
+    python bench_fara3.py cache         - catalog cache hit cost and invalidation
+    python bench_fara3.py etag          - bytes and CPU per request with If-None-Match
+    python bench_fara3.py indexes       - EXPLAIN QUERY PLAN of every endpoint query
+    python bench_fara3.py wal           - read latency during write bursts, per DB profile
+    python bench_fara3.py cart          - get_cart statements and latency by cart size
+    python bench_fara3.py checkout      - create_order statements and latency by basket size
+    python bench_fara3.py orders        - order history statements and latency by history size
+    python bench_fara3.py oversell      - concurrent checkouts racing for scarce stock
+    python bench_fara3.py ordernumbers  - order number throughput and cross-process uniqueness
+    python bench_fara3.py kdf           - password hash cost parameters against a latency budget
+    python bench_fara3.py tokens        - session token verification cost and access checks
+    python bench_fara3.py contact       - write-behind contact inserts: latency, batching and backpressure
+    python bench_fara3.py startup       - cold-start time of a fresh process, new and existing database
+    python bench_fara3.py serialize     - product list rendering with cold and warm row fragments
+    python bench_fara3.py json          - JSON provider size and speed on real API payloads
+    python bench_fara3.py compress      - response compression ratio, cost and per-ETag caching
+    python bench_fara3.py assets        - hashed static assets: caching headers, 304, Range, file_wrapper
+    python bench_fara3.py images        - /img variant render cost, sizes, coalescing and LRU eviction
+    python bench_fara3.py search        - full-text search latency on a 100k-product catalog
+    python bench_fara3.py facets        - facet count cost and accuracy as the catalog grows
+    python bench_fara3.py loadgen       - a short loadgen_fara3.py run, recorded and replayed without errors
+    python bench_fara3.py pagination    - page latency and size as the catalog grows
+"""
+import atexit
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import gzip
+import hashlib
+import io
+import json
+import zlib
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+# Point the app at a scratch database before app1 builds its engine
+_bench_dir = tempfile.mkdtemp(prefix='fara3-bench-')
+atexit.register(shutil.rmtree, _bench_dir, ignore_errors=True)
+os.environ.setdefault('FARA3_DATABASE_URI', 'sqlite:///' + os.path.join(_bench_dir, 'bench.db'))
+os.environ.setdefault('FARA3_IMAGE_CACHE_DIR', os.path.join(_bench_dir, 'image-variants'))
+os.environ.setdefault('FARA3_SECRET_KEY', os.urandom(32).hex())
+
+from sqlalchemy import event, text as text_sql
+
+import app1
+import images
+import loadgen_fara3
+import passwords
+from flask.json.provider import DefaultJSONProvider
+from itsdangerous import URLSafeTimedSerializer
+from werkzeug.test import Client
+from werkzeug.wsgi import FileWrapper
+from app1 import (app, db, initialize_database, catalog_cache, generate_order_number, decode_token, issue_token,
+                  verify_token, write_behind, row_fragments, compressed_cache, asset_digests, asset_manifest, hashed_assets,
+                  image_variants, facet_counts,
+                  FastJSONProvider, PRICE_BUCKET_EDGES, ProductFacetCount, COMPRESSORS, Collection, ContactMessage, OrderItem, Product, User,
+                  WriteBehindQueue)
+
+# =============== HELPERS ===============
+@contextmanager
+def count_statements():
+    """Collect (statement, parameters) for every SQL statement sent inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters[0] if executemany else parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+_seeded = False
+
+def seed_catalog(extra_products=200):
+    """Sample data plus enough extra products to make per-row queries obvious"""
+    global _seeded
+    if _seeded:
+        return
+    _seeded = True
+    initialize_database()
+    with app.app_context():
+        collections = Collection.query.all()
+        db.session.add_all([
+            Product(
+                name=f"Bench Product {i}",
+                description="Benchmark product",
+                details="Generated by bench_fara3.py",
+                price=10.0 + i % 50,
+                image_url="main.png",
+                collection_id=collections[i % len(collections)].id,
+                category="bench",
+                stock=100
+            )
+            for i in range(extra_products)
+        ])
+        db.session.commit()
+
+def register_user(client, email='bench@fara3.test'):
+    """Register a benchmark user if needed, sign client in as them and return their id"""
+    credentials = {'name': 'Bench User', 'email': email, 'password': 'Bench1234'}
+    client.post('/api/auth/register', json=credentials)
+    data = client.post('/api/auth/login', json=credentials).get_json()
+    client.environ_base['HTTP_AUTHORIZATION'] = f"Bearer {data['token']}"
+    return data['user']['id']
+
+def user_client(email):
+    """(test client signed in as a fresh benchmark user, that user's id)"""
+    client = app.test_client()
+    return client, register_user(client, email)
+
+def write_from_another_process(sql):
+    """Run one write statement on the bench database from a separate sqlite3 process"""
+    with app.app_context():
+        database = db.engine.url.database
+    subprocess.run([sys.executable, '-c', 'import sqlite3, sys\n'
+                    'with sqlite3.connect(sys.argv[1]) as connection:\n'
+                    '    connection.execute(sys.argv[2])', database, sql], check=True)
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def time_requests(client, url, iterations, before_each=None, headers=None):
+    """Mean wall time of GET url in milliseconds"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if before_each:
+            before_each()
+        client.get(url, headers=headers)
+    return (time.perf_counter() - started) * 1000 / iterations
+
+# =============== QUERY BUDGET ===============
+# Every catalog request first checks catalog_change for writes made by other processes
+CATALOG_SYNC_STATEMENTS = 1
+
+# Maximum statements each catalog endpoint may issue, whatever the catalog size, besides that check
+CATALOG_QUERY_BUDGET = {
+    '/api/collections': 1,
+    '/api/collections/minimalist': 2,
+    '/api/products': 1,
+    '/api/products?collection=streetwear': 1,
+    '/api/products?featured=true': 1,
+    '/api/products/featured': 1,
+    '/api/products/1': 1,
+    '/api/products/lookup?name=Black%20Hoodie': 1,
+    '/api/products?ids=1,2,3': 1,
+    '/api/products/search?q=black%20hood': 2,
+    '/api/products?collection=streetwear,minimalist&min_price=25&max_price=75&in_stock=true&facets=true': 2,
+    '/api/products?featured=true&min_price=30&max_price=60&facets=true': 2,
+    '/api/products?ids=1,2,3&facets=true': 2,
+}
+
+def bench_queries():
+    seed_catalog()
+    client = app.test_client()
+    failures = 0
+
+    for url, budget in CATALOG_QUERY_BUDGET.items():
+        catalog_cache.invalidate()
+        budget += CATALOG_SYNC_STATEMENTS
+        with app.app_context():
+            with count_statements() as statements:
+                response = client.get(url)
+        status = 'ok' if len(statements) <= budget else 'OVER BUDGET'
+        print(f"{url:<40} {response.status_code}  {len(statements):>3} / {budget} statements  {status}")
+        if response.status_code != 200 or len(statements) > budget:
+            failures += 1
+
+    return failures
+
+# =============== CATALOG CACHE ===============
+def bench_cache(iterations=200):
+    seed_catalog()
+    client = app.test_client()
+    failures = 0
+
+    for url in ('/api/products', '/api/collections', '/api/products/featured'):
+        client.get(url)
+        with app.app_context():
+            with count_statements() as statements:
+                client.get(url)
+        cold = time_requests(client, url, iterations, before_each=catalog_cache.invalidate)
+        hot = time_requests(client, url, iterations)
+        print(f"{url:<30} miss {cold:7.3f} ms   hit {hot:7.3f} ms   statements on hit: {len(statements)}")
+        if len(statements) > CATALOG_SYNC_STATEMENTS:
+            failures += 1
+
+    # A stock decrement through create_order must be visible on the next read
+    user_id = register_user(client)
+    before = client.get('/api/products/1').get_json()['product']['stock']
+    client.post('/api/orders', json={'user_id': user_id, 'items': [{'product_id': 1, 'quantity': 1}]})
+    after = client.get('/api/products/1').get_json()['product']['stock']
+    print(f"stock after order: {before} -> {after}  {'ok' if after == before - 1 else 'STALE'}")
+    if after != before - 1:
+        failures += 1
+
+    # Writes this process's session never sees: a Core UPDATE, and another process writing the file
+    urls = ['/api/products/2', '/api/products/3']
+    for url in urls:
+        client.get(url)
+    with app.app_context():
+        db.session.execute(Product.__table__.update().where(Product.id == 2).values(stock=Product.stock + 3))
+        db.session.commit()
+    write_from_another_process("UPDATE product SET stock = stock + 5 WHERE id = 3")
+    for url in urls:
+        served = client.get(url).get_json()['product']
+        with app.app_context():
+            stored = db.session.get(Product, served['id']).stock
+        print(f"{url} after an outside write: stock {served['stock']}, "
+              f"database {stored}  {'ok' if served['stock'] == stored else 'STALE'}")
+        failures += served['stock'] != stored
+
+    return failures
+
+# =============== CONDITIONAL REQUESTS ===============
+def measure_requests(client, url, iterations, headers=None, before_each=None):
+    """(response bytes, CPU ms) per GET of url"""
+    size = 0
+    started = time.process_time()
+    for _ in range(iterations):
+        if before_each:
+            before_each()
+        size = len(client.get(url, headers=headers).get_data())
+    return size, (time.process_time() - started) * 1000 / iterations
+
+def bench_etag(iterations=300):
+    seed_catalog()
+    client = app.test_client()
+    failures = 0
+
+    print(f"{'endpoint':<30} {'full (uncached)':>22} {'full (cached)':>22} {'304':>22}")
+    for url in ('/api/products', '/api/collections', '/api/products/featured', '/api/collections/minimalist'):
+        uncached = measure_requests(client, url, iterations, before_each=catalog_cache.invalidate)
+        cached = measure_requests(client, url, iterations)
+        etag = client.get(url).headers.get('ETag')
+        conditional = measure_requests(client, url, iterations, headers={'If-None-Match': etag})
+        print(f"{url:<30} " + " ".join(f"{size:>8} B {cpu:8.3f} ms" for size, cpu in (uncached, cached, conditional)))
+        if conditional[0] != 0 or client.get(url, headers={'If-None-Match': etag}).status_code != 304:
+            failures += 1
+
+    # Any catalog write must change the ETag
+    etag = client.get('/api/products').headers.get('ETag')
+    with app.app_context():
+        db.session.get(Product, 1).stock += 1
+        db.session.commit()
+    status = client.get('/api/products', headers={'If-None-Match': etag}).status_code
+    print(f"after stock change: {status} {'ok' if status == 200 else 'STALE'}")
+    if status != 200:
+        failures += 1
+
+    # An ETag names one URL's representation; another URL must not answer 304 to it
+    etags = {url: client.get(url).headers.get('ETag')
+             for url in ('/api/collections', '/api/products', '/api/products?fields=id')}
+    status = client.get('/api/collections/nope', headers={'If-None-Match': etags['/api/collections']}).status_code
+    print(f"distinct ETags per URL: {len(set(etags.values()))} / {len(etags)}, "
+          f"unknown collection with another URL's ETag: {status} {'ok' if status == 404 else 'WRONG'}")
+    if len(set(etags.values())) != len(etags) or status != 404:
+        failures += 1
+
+    return failures
+
+# =============== INDEX USAGE ===============
+# Full scans that are the point of the query rather than a missing index
+ALLOWED_FULL_SCANS = {
+    ('/api/collections', 'collection'),
+    ('/api/products', 'product_facet_count'),  # At most collections x categories x price buckets x 2 x 2 rows
+    ('/api/products', 'facet_rows'),  # product_facet_count rows, or ones grouped from an index range of product
+}
+
+def endpoint_requests(user_id):
+    """(method, url, json) for every endpoint that reads or writes the database"""
+    yield from (('GET', url, None) for url in CATALOG_QUERY_BUDGET)
+    yield 'POST', '/api/cart', {'user_id': user_id, 'product_id': 1, 'quantity': 1}
+    yield 'POST', '/api/cart', {'user_id': user_id, 'product_id': 1, 'quantity': 1}
+    yield 'PATCH', '/api/cart', {'user_id': user_id, 'operations': [
+        {'product_id': 1, 'quantity_delta': -1}, {'product_name': 'White Hoodie', 'quantity_delta': 2}]}
+    yield 'GET', f'/api/cart?user_id={user_id}', None
+    yield 'POST', '/api/orders', {'user_id': user_id, 'items': [{'product_id': 1, 'quantity': 1}]}
+    yield 'GET', f'/api/orders/user/{user_id}', None
+    yield 'GET', f'/api/orders/user/{user_id}?summary=true', None
+    yield 'DELETE', f'/api/cart/clear/{user_id}', None
+
+def bench_indexes():
+    seed_catalog()
+    client = app.test_client()
+    user_id = register_user(client)
+    failures = 0
+
+    for method, url, body in endpoint_requests(user_id):
+        catalog_cache.invalidate()
+        with app.app_context():
+            with count_statements() as statements:
+                client.open(url, method=method, json=body)
+            connection = db.session.connection()
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                    continue
+                plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                for detail in (row[-1] for row in plan):
+                    words = [word for word in detail.split() if word != 'TABLE']  # Older SQLite says SCAN TABLE x
+                    # FTS5 MATCH plans read 'SCAN <table> VIRTUAL TABLE INDEX n:M...', an index lookup
+                    # and SCAN (subquery-n) / SCAN CONSTANT ROW read a derived row set, not a table
+                    full_scan = (words[0] == 'SCAN' and 'USING' not in words and 'VIRTUAL' not in words
+                                 and not words[1].startswith('(') and words[1:3] != ['CONSTANT', 'ROW'])
+                    if full_scan and (url.split('?')[0], words[1]) not in ALLOWED_FULL_SCANS:
+                        print(f"{method:<6} {url:<40} FULL SCAN  {detail}\n       {statement}")
+                        failures += 1
+        print(f"{method:<6} {url:<40} {len(statements)} statements checked")
+
+    return failures
+
+# =============== CONCURRENT READS AND WRITES ===============
+def wal_worker(duration=3.0, readers=4, writers=4):
+    """Readers time cart/order reads while writers commit cart and contact rows"""
+    seed_catalog()
+    sessions = [user_client(f"wal{i}@fara3.test") for i in range(writers)]
+    for client, _ in sessions:
+        client.post('/api/cart', json={'product_id': 2, 'quantity': 1})
+    deadline = time.perf_counter() + duration
+    read_ms = []
+    writes = [0]
+    errors = [0]
+
+    def reader(client, user_id):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.get('/api/cart')
+            read_ms.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors[0] += 1
+
+    def writer(client, user_id):
+        while time.perf_counter() < deadline:
+            responses = [
+                client.post('/api/cart', json={'product_id': 1, 'quantity': 1}),
+                client.post('/api/contact', json={'name': 'Load', 'email': 'load@fara3.test', 'message': 'x' * 200}),
+                client.delete(f'/api/cart/clear/{user_id}'),
+            ]
+            writes[0] += 2
+            errors[0] += sum(response.status_code >= 500 for response in responses[:2])
+
+    threads = [threading.Thread(target=reader, args=sessions[i % writers]) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=session) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+    print(f"{app.config['DATABASE_PROFILE']:<12} {journal_mode:<8} {len(read_ms):>7} reads  {writes[0]:>6} writes  "
+          f"p50 {percentile(read_ms, 50):7.2f} ms  p99 {percentile(read_ms, 99):7.2f} ms  "
+          f"max {max(read_ms):8.2f} ms  errors {errors[0]}")
+    return 1 if errors[0] else 0
+
+def bench_wal():
+    # The profile is fixed when the engine is created, so each one runs in a fresh process
+    failures = 0
+    for profile in ('default', 'production'):
+        env = dict(os.environ, FARA3_DB_PROFILE=profile,
+                   FARA3_DATABASE_URI='sqlite:///' + os.path.join(_bench_dir, f'wal-{profile}.db'))
+        result = subprocess.run([sys.executable, __file__, '--wal-worker'], env=env,
+                                capture_output=True, text=True, encoding='utf-8')
+        print(result.stdout.splitlines()[-1] if result.stdout else result.stderr)
+        failures += result.returncode != 0
+    return failures
+
+# =============== CART ===============
+def bench_cart(iterations=100):
+    seed_catalog()
+    client = app.test_client()
+    user_id = register_user(client, 'cart@fara3.test')
+    in_cart = 0
+    counts = []
+
+    for cart_size in (1, 10, 50, 150):
+        for product_id in range(11 + in_cart, 11 + cart_size):
+            client.post('/api/cart', json={'user_id': user_id, 'product_id': product_id, 'quantity': 2})
+        in_cart = cart_size
+        url = f'/api/cart?user_id={user_id}'
+        with app.app_context():
+            with count_statements() as statements:
+                client.get(url)
+        counts.append(len(statements))
+        print(f"{cart_size:>4} items  {len(statements)} statements  {time_requests(client, url, iterations):7.3f} ms")
+
+    client.delete(f'/api/cart/clear/{user_id}')
+
+    # A local cart synced on login may name products the catalog lacks; the rest must still apply
+    response = client.patch('/api/cart', json={'operations': [
+        {'product_name': 'Black Hoodie', 'quantity_delta': 2}, {'product_name': 'Classic Hat', 'quantity_delta': 1}]})
+    data = response.get_json()
+    synced = [(item['product_name'], item['quantity']) for item in data.get('cart_items', [])]
+    print(f"PATCH with an unknown name: {response.status_code}  cart {synced}  unknown {data.get('unknown_products')}")
+    client.delete(f'/api/cart/clear/{user_id}')
+    partial_ok = response.status_code == 200 and synced == [('Black Hoodie', 2)] \
+        and data['unknown_products'] == ['Classic Hat']
+
+    # POST only ever adds; a bad or non-positive quantity must not reach the cart
+    client.post('/api/cart', json={'product_id': 1, 'quantity': 3})
+    statuses = [client.post('/api/cart', json={'product_id': 1, 'quantity': quantity}).status_code
+                for quantity in ('abc', None, -2, 0)]
+    left = [item['quantity'] for item in client.get('/api/cart').get_json()['cart_items']]
+    print(f"POST quantity abc, null, -2, 0: {statuses}  cart {left}")
+    client.delete(f'/api/cart/clear/{user_id}')
+    quantities_ok = statuses == [400] * 4 and left == [3]
+    return 1 if set(counts) != {1} or not partial_ok or not quantities_ok else 0
+
+# =============== CHECKOUT ===============
+def bench_checkout():
+    seed_catalog()
+    client = app.test_client()
+    user_id = register_user(client, 'checkout@fara3.test')
+    counts = []
+
+    for basket_size in (1, 5, 20, 50):
+        items = [{'product_id': product_id, 'quantity': 1} for product_id in range(11, 11 + basket_size)]
+        with app.app_context():
+            with count_statements() as statements:
+                started = time.perf_counter()
+                response = client.post('/api/orders', json={'user_id': user_id, 'items': items})
+                elapsed = (time.perf_counter() - started) * 1000
+        counts.append(len(statements))
+        print(f"{basket_size:>3} items  {response.status_code}  {len(statements):>3} statements  {elapsed:7.2f} ms")
+
+    return 1 if len(set(counts)) != 1 else 0
+
+def bench_orders(iterations=50):
+    seed_catalog()
+    client = app.test_client()
+    user_id = register_user(client, 'history@fara3.test')
+    basket = {'user_id': user_id, 'items': [{'product_id': 11, 'quantity': 1}, {'product_id': 12, 'quantity': 1}]}
+    placed = 0
+    failures = 0
+
+    for history in (10, 100, 500):
+        for _ in range(placed, history):
+            client.post('/api/orders', json=basket)
+        placed = history
+        for url, budget in ((f'/api/orders/user/{user_id}', 2), (f'/api/orders/user/{user_id}?summary=true', 1)):
+            with app.app_context():
+                with count_statements() as statements:
+                    client.get(url)
+            print(f"{history:>4} orders  {url:<40} {len(statements)} / {budget} statements  "
+                  f"{time_requests(client, url, iterations):7.3f} ms")
+            failures += len(statements) > budget
+
+    return failures
+
+def bench_oversell(threads=32, scarce_stock=100):
+    seed_catalog()
+    sessions = [user_client(f"race{i}@fara3.test") for i in range(threads)]
+    with app.app_context():
+        scarce = Product(name="Oversell Probe", price=1.0, stock=scarce_stock)
+        plenty = Product(name="Oversell Filler", price=1.0, stock=1000000)
+        db.session.add_all([scarce, plenty])
+        db.session.commit()
+        scarce_id, plenty_id = scarce.id, plenty.id
+    statuses = {}
+    lock = threading.Lock()
+
+    def shopper(client, seed):
+        rng = random.Random(seed)
+        # Every basket also takes filler stock, which must be rolled back when the probe runs short
+        basket = {'items': [
+            {'product_id': plenty_id, 'quantity': 1},
+            {'product_id': scarce_id, 'quantity': rng.randint(1, 3)},
+        ]}
+        for _ in range(20):
+            status = client.post('/api/orders', json=basket).status_code
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    workers = [threading.Thread(target=shopper, args=(client, i)) for i, (client, _) in enumerate(sessions)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        sold = dict(db.session.query(OrderItem.product_id, db.func.sum(OrderItem.quantity))
+                    .filter(OrderItem.product_id.in_([scarce_id, plenty_id]))
+                    .group_by(OrderItem.product_id).all())
+        scarce_left = db.session.get(Product, scarce_id).stock
+        plenty_left = db.session.get(Product, plenty_id).stock
+
+    print(f"{sum(statuses.values())} checkouts in {elapsed:.2f}s  statuses {dict(sorted(statuses.items()))}")
+    print(f"probe:  stock {scarce_stock} -> {scarce_left}, sold {sold.get(scarce_id, 0)}")
+    print(f"filler: stock 1000000 -> {plenty_left}, sold {sold.get(plenty_id, 0)}")
+    consistent = (
+        scarce_left >= 0
+        and sold.get(scarce_id, 0) == scarce_stock - scarce_left
+        and sold.get(plenty_id, 0) == 1000000 - plenty_left
+    )
+    print('no oversell, no leaked reservations' if consistent else 'INCONSISTENT STOCK')
+    return 0 if consistent else 1
+
+# =============== ORDER NUMBERS ===============
+def order_number_worker(count=20000, threads=4):
+    """Print count order numbers generated from several threads, one per line"""
+    numbers = []
+    lock = threading.Lock()
+
+    def generate():
+        with app.app_context():
+            batch = [generate_order_number() for _ in range(count // threads)]
+        with lock:
+            numbers.extend(batch)
+
+    workers = [threading.Thread(target=generate) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    sys.stdout.write('\n'.join(numbers) + '\n')
+    return 0
+
+def bench_ordernumbers(count=100000, processes=4):
+    seed_catalog()
+    failures = 0
+
+    with app.app_context():
+        started = time.perf_counter()
+        numbers = [generate_order_number() for _ in range(count)]
+        elapsed = time.perf_counter() - started
+    print(f"single process: {count / elapsed:,.0f} numbers/s, {len(set(numbers))} unique of {count}")
+    failures += len(set(numbers)) != count
+
+    # Several processes with several threads each, all sharing the bench database
+    started = time.perf_counter()
+    workers = [subprocess.Popen([sys.executable, __file__, '--order-number-worker'],
+                                stdout=subprocess.PIPE, text=True) for _ in range(processes)]
+    outputs = [worker.communicate()[0].split() for worker in workers]
+    elapsed = time.perf_counter() - started
+    generated = [number for output in outputs for number in output]
+    unique = len(set(generated) | set(numbers))
+    print(f"{processes} processes: {len(generated)} numbers in {elapsed:.2f}s (including start-up), "
+          f"{unique - len(numbers)} unique of {len(generated)}")
+    failures += unique != len(generated) + len(numbers)
+
+    return failures
+
+# =============== PASSWORD HASHING ===============
+def bench_kdf(samples=5):
+    # Latency one hash may add to a login; override with FARA3_KDF_BUDGET_MS
+    budget_ms = float(os.environ.get('FARA3_KDF_BUDGET_MS', 100))
+    candidates = []
+
+    print(f"budget {budget_ms:.0f} ms per hash")
+    for log_n in range(12, 18):
+        n = 2 ** log_n
+        started = time.perf_counter()
+        for _ in range(samples):
+            passwords.hash_password('Bench1234', n=n)
+        ms = (time.perf_counter() - started) * 1000 / samples
+        print(f"scrypt n=2^{log_n:<2} r=8 p=1   {ms:8.2f} ms  {128 * 8 * n // 2 ** 20:>4} MiB")
+        if ms <= budget_ms:
+            candidates.append((f"SCRYPT_N = 2 ** {log_n}", ms))
+    for iterations in (100000, 300000, 600000, 1200000):
+        started = time.perf_counter()
+        for _ in range(samples):
+            hashlib.pbkdf2_hmac('sha256', b'Bench1234', b'salt' * 4, iterations)
+        ms = (time.perf_counter() - started) * 1000 / samples
+        print(f"pbkdf2_sha256 {iterations:>8} iter {ms:8.2f} ms")
+
+    if candidates:
+        setting, ms = candidates[-1]
+        print(f"strongest scrypt within budget: {setting} ({ms:.1f} ms); "
+              f"current: SCRYPT_N = 2 ** {passwords.SCRYPT_N.bit_length() - 1}")
+
+    # End-to-end login, including the transparent upgrade of a legacy plaintext password
+    seed_catalog()
+    client = app.test_client()
+    with app.app_context():
+        db.session.add(User(name='Legacy', email='legacy@fara3.test', password='Legacy1234'))
+        db.session.commit()
+    credentials = {'email': 'legacy@fara3.test', 'password': 'Legacy1234'}
+    first = client.post('/api/auth/login', json=credentials).status_code
+    with app.app_context():
+        stored = User.query.filter_by(email='legacy@fara3.test').one().password
+    started = time.perf_counter()
+    statuses = [client.post('/api/auth/login', json=credentials).status_code for _ in range(samples)]
+    login_ms = (time.perf_counter() - started) * 1000 / samples
+    upgraded = not passwords.needs_rehash(stored)
+    print(f"legacy login {first}, rehashed: {upgraded}, hashed login {login_ms:.1f} ms")
+
+    # A wrong password and an unknown email must cost the same, or timing reveals who has an account
+    def failed_login_ms(email):
+        started = time.perf_counter()
+        for _ in range(samples):
+            client.post('/api/auth/login', json={'email': email, 'password': 'Wrong1234'})
+        return (time.perf_counter() - started) * 1000 / samples
+    failed_login_ms('nobody@fara3.test')  # Builds the dummy hash once
+    wrong_password_ms, unknown_email_ms = failed_login_ms('legacy@fara3.test'), failed_login_ms('nobody@fara3.test')
+    timing_ok = 0.5 < unknown_email_ms / wrong_password_ms < 2
+    print(f"failed login: wrong password {wrong_password_ms:.1f} ms, unknown email {unknown_email_ms:.1f} ms "
+          f"{'ok' if timing_ok else 'DIFFERENT'}")
+
+    # A corrupt stored hash is a failed login, not a 500, and costs the same as any other
+    salt = '00' * passwords.SALT_BYTES
+    with app.app_context():
+        db.session.add_all([
+            User(name='Corrupt', email='corrupt-scrypt@fara3.test', password=f"scrypt$16384$8$1${salt}$not-hex"),
+            User(name='Corrupt', email='corrupt-pbkdf2@fara3.test', password=f"pbkdf2_sha256$600000$zz${salt}"),
+        ])
+        db.session.commit()
+    corrupt = [client.post('/api/auth/login', json={'email': email, 'password': 'Wrong1234'}).status_code
+               for email in ('corrupt-scrypt@fara3.test', 'corrupt-pbkdf2@fara3.test')]
+    corrupt_ms = failed_login_ms('corrupt-scrypt@fara3.test')
+    corrupt_ok = corrupt == [401, 401] and 0.5 < corrupt_ms / wrong_password_ms < 2
+    print(f"corrupt stored hash: {corrupt}, {corrupt_ms:.1f} ms {'ok' if corrupt_ok else 'DIFFERENT'}")
+
+    bad_types = [client.post('/api/auth/register', json={'name': 'X', 'email': 'x@fara3.test', 'password': 123}).status_code,
+                 client.post('/api/auth/login', json={'email': 'legacy@fara3.test', 'password': ['Legacy1234']}).status_code]
+    print(f"non-string password on register/login: {bad_types}")
+
+    return 0 if first == 200 and upgraded and set(statuses) == {200} and timing_ok and corrupt_ok \
+        and bad_types == [400, 400] else 1
+
+# =============== SESSION TOKENS ===============
+def bench_tokens(iterations=20000):
+    seed_catalog()
+    tokens = [issue_token(user_id) for user_id in range(iterations)]
+
+    decode_token.cache_clear()
+    started = time.perf_counter()
+    for token in tokens:
+        verify_token(token)
+    cold_us = (time.perf_counter() - started) * 1e6 / iterations
+    started = time.perf_counter()
+    for _ in range(iterations):
+        verify_token(tokens[-1])
+    hot_us = (time.perf_counter() - started) * 1e6 / iterations
+    print(f"verify_token: {cold_us:.1f} us with HMAC, {hot_us:.1f} us from the LRU")
+
+    client, user_id = user_client('tokens@fara3.test')
+    with app.app_context():
+        with count_statements() as statements:
+            client.get('/api/cart')
+    anonymous = app.test_client()
+    # The signing key used to be a literal in this repo; tokens minted with it must not work
+    old_key_token = URLSafeTimedSerializer('fara3-fashion-2024-secret-key', salt='fara3-auth').dumps({'uid': user_id})
+    checks = {
+        'cart read statements': (len(statements), 1),
+        'no token': (anonymous.get('/api/cart').status_code, 401),
+        'forged token': (anonymous.get('/api/cart', headers={'Authorization': 'Bearer ' + tokens[0][:-2] + 'xx'})
+                         .status_code, 401),
+        'token from the old key': (anonymous.get('/api/cart', headers={'Authorization': 'Bearer ' + old_key_token})
+                                   .status_code, 401),
+        "another user's orders": (client.get(f'/api/orders/user/{user_id + 1}').status_code, 403),
+    }
+    for name, (actual, expected) in checks.items():
+        print(f"{name:<24} {actual:>4}  {'ok' if actual == expected else 'expected %s' % expected}")
+    return sum(actual != expected for actual, expected in checks.values())
+
+# =============== WRITE-BEHIND ===============
+def bench_contact(messages=2000):
+    seed_catalog()
+    client = app.test_client()
+    payload = {'name': 'Bench', 'email': 'contact@fara3.test', 'message': 'x' * 200}
+    with app.app_context():
+        before = ContactMessage.query.count()
+        database_path = db.engine.url.database
+
+    latencies = []
+    with app.app_context(), count_statements() as statements:
+        for _ in range(messages):
+            started = time.perf_counter()
+            status = client.post('/api/contact', json=payload).status_code
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status != 202:
+                print(f"unexpected status {status}")
+                return 1
+        write_behind.join()
+    inserts = sum(statement.lstrip().upper().startswith('INSERT') for statement, _ in statements)
+    with app.app_context():
+        stored = ContactMessage.query.count() - before
+    print(f"{messages} posts  p50 {percentile(latencies, 50):.3f} ms  p99 {percentile(latencies, 99):.3f} ms  "
+          f"{stored} rows stored in {inserts} INSERT batches")
+
+    # Hold SQLite's write lock so the flusher stalls and a small queue fills up
+    full_queue = WriteBehindQueue(max_pending=10, batch_size=5, interval=0.01)
+    app1.write_behind = full_queue
+    locker = sqlite3.connect(database_path)
+    try:
+        locker.execute('BEGIN IMMEDIATE')
+        statuses = [client.post('/api/contact', json=payload).status_code for _ in range(50)]
+    finally:
+        locker.rollback()
+        locker.close()
+        app1.write_behind = write_behind
+        full_queue.drain()
+    with app.app_context():
+        stored_after_drain = ContactMessage.query.count() - before - stored
+    print(f"full queue: {statuses.count(202)} accepted, {statuses.count(429)} refused with 429, "
+          f"{stored_after_drain} stored by drain()")
+
+    # Bad input is refused up front, and a row that still fails only loses itself, not its batch
+    bad_status = client.post('/api/contact', json={**payload, 'name': {'x': 1}}).status_code
+    with app.app_context():
+        count_before = ContactMessage.query.count()
+    row = {'name': 'Bench', 'email': 'bench@fara3.test', 'message': 'Hello', 'submitted_at': datetime.utcnow(),
+           'is_read': False}
+    write_behind.submit(ContactMessage, row)
+    write_behind.submit(ContactMessage, {**row, 'name': {'x': 1}})  # Unbindable, fails the batch INSERT
+    write_behind.submit(ContactMessage, row)
+    write_behind.join()
+    with app.app_context():
+        survivors = ContactMessage.query.count() - count_before
+    print(f"non-string name: {bad_status}, batch with one bad row: {survivors} of 2 good rows stored")
+
+    return 0 if (stored == messages and inserts < messages // 10 and statuses.count(429)
+                 and stored_after_drain == statuses.count(202) and bad_status == 400 and survivors == 2) else 1
+
+# =============== STARTUP ===============
+STARTUP_SNIPPET = '''
+import time
+started = time.perf_counter()
+import app1
+imported = time.perf_counter()
+app1.initialize_database()
+print(f"{(imported - started) * 1000:.1f} {(time.perf_counter() - imported) * 1000:.1f}")
+'''
+WARM_START_BUDGET_MS = 30
+
+def bench_startup(runs=5):
+    env = dict(os.environ, FARA3_DATABASE_URI='sqlite:///' + os.path.join(_bench_dir, 'startup.db'))
+    results = []
+    for run in range(runs + 1):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', STARTUP_SNIPPET], env=env, cwd=os.path.dirname(__file__) or '.',
+                                capture_output=True, text=True, encoding='utf-8')
+        process_ms = (time.perf_counter() - started) * 1000
+        if result.returncode != 0:
+            print(result.stderr)
+            return 1
+        import_ms, init_ms = map(float, result.stdout.splitlines()[-1].split())
+        results.append((import_ms, init_ms, process_ms))
+        print(f"{'new database' if run == 0 else 'existing':<14} import app1 {import_ms:7.1f} ms  "
+              f"initialize_database {init_ms:7.1f} ms  process {process_ms:7.1f} ms")
+
+    warm_init_ms = percentile([init_ms for _, init_ms, _ in results[1:]], 50)
+    print(f"median warm initialize_database {warm_init_ms:.1f} ms (budget {WARM_START_BUDGET_MS} ms)")
+    return 1 if warm_init_ms > WARM_START_BUDGET_MS else 0
+
+# =============== ROW SERIALIZERS ===============
+def bench_serialize(iterations=200):
+    seed_catalog()
+    client = app.test_client()
+    failures = 0
+
+    def drop_fragments():
+        catalog_cache.invalidate()
+        row_fragments.invalidate(Product)
+
+    print(f"{'endpoint':<34} {'cold fragments':>15} {'warm fragments':>15}")
+    for url in ('/api/products?limit=200', '/api/products/featured', '/api/collections/minimalist'):
+        cold_ms = time_requests(client, url, iterations, before_each=drop_fragments)
+        warm_ms = time_requests(client, url, iterations, before_each=catalog_cache.invalidate)
+        print(f"{url:<34} {cold_ms:12.3f} ms {warm_ms:12.3f} ms")
+
+    # Fragments are warm now; change one product through the ORM and one through checkout's bulk UPDATE
+    with app.app_context():
+        db.session.get(Product, 11).price = 12.5
+        db.session.commit()
+    user_client('serialize@fara3.test')[0].post('/api/orders', json={'items': [{'product_id': 12, 'quantity': 1}]})
+    # and, once fragments are warm again, one from another process, which only catalog_change reports
+    catalog_cache.invalidate()
+    client.get('/api/products?limit=200')
+    write_from_another_process("UPDATE product SET price = 77.5 WHERE id = 13")
+    with app.app_context():
+        expected = {p.id: (p.name, p.price, p.stock, p.created_at.isoformat()) for p in Product.query.all()}
+    catalog_cache.invalidate()
+    listed = client.get('/api/products?limit=200').get_json()['products']
+    stale = [row['id'] for row in listed
+             if (row['name'], row['price'], row['stock'], row['created_at']) != expected[row['id']]]
+    print(f"{len(listed)} rows checked against the ORM, stale: {stale or 'none'}")
+    failures += bool(stale)
+
+    return failures
+
+# =============== JSON PROVIDER ===============
+def bench_json(iterations=500):
+    seed_catalog()
+    client, user_id = user_client('json@fara3.test')
+    client.patch('/api/cart', json={'operations': [{'product_id': product_id, 'quantity_delta': 1}
+                                                   for product_id in range(1, 11)]})
+    client.post('/api/orders', json={'items': [{'product_id': product_id, 'quantity': 1}
+                                               for product_id in range(11, 31)]})
+    # Decoded responses of real endpoints, re-encoded by each provider
+    payloads = {url: client.get(url).get_json() for url in (
+        '/api/collections', '/api/products?limit=200', '/api/products/featured',
+        '/api/cart', f'/api/orders/user/{user_id}',
+    )}
+    providers = {'default': DefaultJSONProvider(app), 'fast': FastJSONProvider(app)}
+    print(f"fast backend: {'orjson' if app1.orjson else 'stdlib json'}")
+    print(f"{'payload':<28} {'default':>22} {'fast':>22}")
+    failures = 0
+
+    with app.app_context():
+        for url, payload in payloads.items():
+            results = []
+            for provider in providers.values():
+                body = provider.response(payload).get_data()
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    provider.response(payload)
+                results.append((len(body), (time.perf_counter() - started) * 1e6 / iterations, body))
+            print(f"{url:<28} " + " ".join(f"{size:>8} B {us:8.1f} us" for size, us, _ in results))
+            failures += json.loads(results[0][2]) != json.loads(results[1][2])
+
+    return failures
+
+# =============== RESPONSE COMPRESSION ===============
+DECOMPRESSORS = {'gzip': gzip.decompress, 'deflate': zlib.decompress}
+
+def bench_compress(iterations=200):
+    seed_catalog()
+    client = app.test_client()
+    failures = 0
+
+    def drop_compressed():
+        compressed_cache.invalidate()
+
+    print(f"available encodings: {', '.join(COMPRESSORS)}")
+    print(f"{'endpoint':<28} {'encoding':<8} {'identity':>10} {'compressed':>12} {'first':>11} {'cached':>11}")
+    for url in ('/api/products?limit=200', '/api/collections', '/api/products/featured'):
+        identity = client.get(url).get_data()
+        for encoding in COMPRESSORS:
+            headers = {'Accept-Encoding': encoding}
+            response = client.get(url, headers=headers)
+            body = response.get_data()
+            compressed = response.headers.get('Content-Encoding') == encoding
+            if compressed:
+                decoded = DECOMPRESSORS[encoding](body) if encoding in DECOMPRESSORS else None
+                failures += decoded is not None and decoded != identity
+                failures += client.get(url, headers={**headers, 'If-None-Match': response.headers['ETag']}) \
+                    .status_code != 304
+            first_ms = time_requests(client, url, iterations, drop_compressed, headers) if compressed else 0
+            cached_ms = time_requests(client, url, iterations, headers=headers)
+            print(f"{url:<28} {encoding:<8} {len(identity):>8} B {len(body):>10} B "
+                  f"{first_ms:8.3f} ms {cached_ms:8.3f} ms{'' if compressed else '  (sent as-is)'}")
+        # Bodies at or over the threshold must have been compressed
+        failures += len(identity) >= app.config['COMPRESSION_MIN_BYTES'] and not compressed
+
+    for asset in ('web1.js', 'web1.css', 'web1.html'):
+        url = f'/assets/{asset_manifest()[asset]}'
+        identity = client.get(url).get_data()
+        sizes = []
+        for encoding in COMPRESSORS:
+            response = client.get(url, headers={'Accept-Encoding': encoding})
+            sizes.append(f"{encoding} {len(response.get_data()):>7} B")
+            failures += response.headers.get('Content-Encoding') != encoding
+        print(f"{asset:<28} identity {len(identity):>7} B  {'  '.join(sizes)}")
+
+    # Two catalog URLs at the same version must each get their own compressed body
+    compressed_cache.invalidate()
+    catalog_cache.invalidate()
+    mixed = []
+    for url in ('/api/collections', '/api/products', '/api/products?fields=id,name'):
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        mixed.append(gzip.decompress(response.get_data()) != client.get(url).get_data())
+    # Even when two URLs share an ETag, the middleware must not hand one's body to the other
+    def same_etag_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'application/json'), ('ETag', '"shared"')])
+        return [json.dumps({'path': environ['PATH_INFO'], 'pad': 'x' * 2048}).encode()]
+    middleware = app1.CompressionMiddleware(same_etag_app, 1024, app1.CatalogCache(1024 * 1024))
+    shared = Client(middleware)
+    for path in ('/a', '/b', '/a?x=1'):
+        body = gzip.decompress(shared.get(path, headers={'Accept-Encoding': 'gzip'}).get_data())
+        mixed.append(json.loads(body)['path'] != path.split('?')[0])
+    print(f"compressed bodies served for the wrong URL: {sum(mixed)} of {len(mixed)}")
+
+    return failures + sum(mixed)
+
+# =============== STATIC ASSETS ===============
+class CountingFileWrapper(FileWrapper):
+    """Stands in for the server's wsgi.file_wrapper and counts the files handed to it"""
+    wrapped = 0
+
+    def __init__(self, file, buffer_size=8192):
+        CountingFileWrapper.wrapped += 1
+        super().__init__(file, buffer_size)
+
+def bench_assets(iterations=50):
+    started = time.perf_counter()
+    asset_digests.cache_clear()
+    asset_manifest.cache_clear()
+    hashed_assets.cache_clear()
+    manifest = asset_manifest()
+    print(f"hashed {len(manifest)} assets in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    client = app.test_client()
+    client.environ_base['wsgi.file_wrapper'] = CountingFileWrapper
+    checks = {'manifest lists web1.js': ('web1.js' in client.get('/assets/manifest.json').get_json(), True)}
+
+    name = max(manifest, key=lambda name: os.path.getsize(os.path.join(os.path.dirname(os.path.abspath(__file__)), name)))
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as asset_file:
+        raw = asset_file.read()
+    url = f'/assets/{manifest[name]}'
+    response = client.get(url)
+    etag = response.headers['ETag']
+    checks.update({
+        'hashed 200': (response.status_code, 200),
+        'body matches file': (response.get_data() == raw, True),
+        'immutable': ('immutable' in response.headers['Cache-Control'], True),
+        'strong ETag': (etag.startswith('W/'), False),
+        'served through file_wrapper': (CountingFileWrapper.wrapped > 0, True),
+        'If-None-Match': (client.get(url, headers={'If-None-Match': etag}).status_code, 304),
+        'Range status': (client.get(url, headers={'Range': 'bytes=100-1099'}).status_code, 206),
+        'Range body': (client.get(url, headers={'Range': 'bytes=100-1099'}).get_data() == raw[100:1100], True),
+        'plain name revalidates': (client.get(f'/assets/{name}').headers['Cache-Control'], 'no-cache'),
+        'unknown asset': (client.get('/assets/app1.py').status_code, 404),
+        'stale hash': (client.get(f'/assets/{name}.0000').status_code, 404),
+    })
+    for check, (actual, expected) in checks.items():
+        print(f"{check:<28} {actual!s:>8}  {'ok' if actual == expected else 'expected %s' % expected}")
+
+    ms = time_requests(client, url, iterations)
+    print(f"{name}: {len(raw)} B in {ms:.2f} ms per request ({len(raw) / ms / 1000:.0f} MB/s)")
+    return sum(actual != expected for actual, expected in checks.values())
+
+# =============== IMAGE VARIANTS ===============
+def bench_images(threads=16):
+    seed_catalog()
+    client = app.test_client()
+    asset_dir = os.path.dirname(os.path.abspath(__file__))
+    name = 'aaaa.jpg'
+    with open(os.path.join(asset_dir, name), 'rb') as image_file:
+        original = image_file.read()
+    checks = {
+        'unknown image': (client.get('/img/nope.jpg?w=160').status_code, 404),
+        'not an image': (client.get('/img/web1.js?w=160').status_code, 404),
+        'bad fmt': (client.get(f'/img/{name}?fmt=tiff').status_code, 400),
+    }
+
+    if not images.available:
+        checks['original served without Pillow'] = (client.get(f'/img/{name}?w=160').get_data() == original, True)
+    else:
+        print(f"{'variant':<22} {'size':>10} {'first':>10} {'cached':>10}")
+        for width, fmt in ((160, 'webp'), (640, 'webp'), (640, 'jpeg'), (1920, 'png')):
+            url = f'/img/{asset_manifest()[name]}?w={width}&fmt={fmt}'
+            started = time.perf_counter()
+            response = client.get(url)
+            first_ms = (time.perf_counter() - started) * 1000
+            cached_ms = time_requests(client, url, 20)
+            print(f"{'w=%d %s' % (width, fmt):<22} {len(response.get_data()):>8} B {first_ms:7.1f} ms {cached_ms:7.2f} ms")
+            with images.Image.open(io.BytesIO(response.get_data())) as variant:
+                checks[f'w={width} {fmt} width'] = (variant.width <= width, True)
+        print(f"original {len(original)} B")
+
+        # Concurrent first requests for one variant must share a single render
+        renders = image_variants.renders
+        barrier = threading.Barrier(threads)
+        statuses = []
+
+        def fetch():
+            barrier.wait()
+            statuses.append(app.test_client().get(f'/img/{name}?w=320&fmt=jpeg').status_code)
+
+        workers = [threading.Thread(target=fetch) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        checks[f'{threads} concurrent requests, renders'] = (image_variants.renders - renders, 1)
+        checks['concurrent statuses'] = (set(statuses), {200})
+
+        # A cache with room for two and a half variants keeps the two most recently used ones
+        small = images.VariantCache(os.path.join(_bench_dir, 'small-variants'), 0)
+        source = os.path.join(asset_dir, name)
+        first = small.path(source, 'first', 160, 'webp')
+        small.max_bytes = os.path.getsize(first) * 5 // 2
+        second = small.path(source, 'second', 160, 'webp')
+        small.path(source, 'first', 160, 'webp')  # Touch, so 'second' is now least recently used
+        small.path(source, 'third', 160, 'webp')
+        on_disk = os.listdir(small.directory)
+        checks['LRU evicted the oldest'] = (os.path.basename(second) in on_disk, False)
+        checks['LRU kept the touched one'] = (os.path.basename(first) in on_disk, True)
+        checks['LRU within budget'] = (sum(os.path.getsize(os.path.join(small.directory, file))
+                                           for file in on_disk) <= small.max_bytes, True)
+
+        # Another process may still be writing a fresh temp file; only stale ones are cleaned up
+        shared_dir = os.path.join(_bench_dir, 'shared-variants')
+        os.makedirs(shared_dir)
+        for temp_name, age in (('fresh.tmp', 0), ('stale.tmp', images.STALE_TEMP_SECONDS + 60)):
+            temp_path = os.path.join(shared_dir, temp_name)
+            open(temp_path, 'wb').close()
+            os.utime(temp_path, (time.time() - age,) * 2)
+        images.VariantCache(shared_dir, 10 ** 7).path(source, 'shared', 160, 'webp')
+        left = sorted(file for file in os.listdir(shared_dir) if file.endswith('.tmp'))
+        checks['temp files left at startup'] = (','.join(left), 'fresh.tmp')
+
+        # A source past Pillow's pixel limit is refused, not a 500
+        max_pixels = images.Image.MAX_IMAGE_PIXELS
+        images.Image.MAX_IMAGE_PIXELS = 1000
+        try:
+            checks['decompression bomb'] = (client.get(f'/img/{name}?w=960&fmt=png').status_code, 422)
+        finally:
+            images.Image.MAX_IMAGE_PIXELS = max_pixels
+
+    result = app.test_cli_runner().invoke(args=['pregenerate-images'])
+    print(result.output.strip())
+    checks['pregenerate-images exit code'] = (result.exit_code, 0)
+
+    for check, (actual, expected) in checks.items():
+        print(f"{check:<34} {actual!s:>8}  {'ok' if actual == expected else 'expected %s' % expected}")
+    return sum(actual != expected for actual, expected in checks.values())
+
+# =============== FULL-TEXT SEARCH ===============
+SEARCH_COLORS = ['black', 'white', 'grey', 'navy', 'olive', 'sand', 'burgundy', 'cream', 'charcoal', 'teal',
+                 'mustard', 'rust', 'lilac', 'forest', 'ivory', 'cobalt', 'blush', 'khaki', 'denim', 'mint']
+SEARCH_ITEMS = ['hoodie', 'tee', 'jacket', 'cargo', 'jogger', 'shirt', 'coat', 'beanie', 'cap', 'sweater',
+                'parka', 'blazer', 'shorts', 'polo', 'vest', 'cardigan', 'overshirt', 'tracksuit', 'bomber', 'chino']
+SEARCH_MATERIALS = ['cotton', 'fleece', 'linen', 'wool', 'nylon', 'denim', 'corduroy', 'cashmere', 'jersey', 'twill']
+SEARCH_FITS = ['oversized', 'slim', 'relaxed', 'boxy', 'cropped', 'tailored', 'regular', 'loose']
+SEARCH_QUERIES = {
+    'one word': 'parka',
+    'two words': 'burgundy cashmere',
+    'prefix': 'cardi',
+    'two-letter prefix': 'bo',
+    'collection name': 'streetwear',
+    'rare word': 'lilac bomber corduroy',
+    'no match': 'spaceship',
+}
+# Typical (median) uncached request time; p95 is reported but noisy on shared machines
+SEARCH_LATENCY_BUDGET_MS = 10
+
+def search_worker(total_products=100000, iterations=50):
+    """Build a synthetic catalog and time /api/products/search uncached"""
+    initialize_database()
+    random.seed(3)
+    with app.app_context():
+        collection_ids = [col.id for col in Collection.query.all()]
+        # The oldest product is the only one named for a word that ~2% of later details mention
+        rows = [{
+            'name': 'Heritage Linen Jacket', 'description': 'linen jacket', 'details': 'Made from linen.',
+            'price': 120.0, 'image_url': 'main.png', 'collection_id': collection_ids[0],
+            'category': 'search', 'stock': 10, 'created_at': datetime.utcnow(), 'is_featured': False,
+        }]
+        for i in range(total_products):
+            color, item = random.choice(SEARCH_COLORS), random.choice(SEARCH_ITEMS)
+            material, fit = random.choice(SEARCH_MATERIALS), random.choice(SEARCH_FITS)
+            rows.append({
+                'name': f"{color.title()} {fit.title()} {item.title()} {i}",
+                'description': f"{fit} {material} {item} in {color}",
+                'details': f"Made from {material}. {random.choice(SEARCH_COLORS)} lining, "
+                           f"{random.choice(SEARCH_FITS)} cut, pairs with a {random.choice(SEARCH_ITEMS)}."
+                           + (" A heritage piece." if random.random() < 0.02 else ""),
+                'price': 10.0 + i % 90,
+                'image_url': 'main.png',
+                'collection_id': random.choice(collection_ids),
+                'category': 'search',
+                'stock': 10,
+                'created_at': datetime.utcnow(),
+                'is_featured': False,
+            })
+        started = time.perf_counter()
+        db.session.execute(Product.__table__.insert(), rows)
+        db.session.commit()
+        print(f"inserted and indexed {total_products} products in {time.perf_counter() - started:.1f}s")
+
+    client = app.test_client()
+    failures = 0
+    print(f"{'query':<18} {'text':<22} {'hits':>5} {'p50':>9} {'p95':>9}")
+    for label, text in SEARCH_QUERIES.items():
+        url = f'/api/products/search?q={text.replace(" ", "%20")}'
+        hits = len(client.get(url).get_json()['products'])
+        samples = []
+        for _ in range(iterations):
+            catalog_cache.invalidate()
+            started = time.perf_counter()
+            client.get(url)
+            samples.append((time.perf_counter() - started) * 1000)
+        p50 = percentile(samples, 50)
+        print(f"{label:<18} {text:<22} {hits:>5} {p50:6.2f} ms {percentile(samples, 95):6.2f} ms")
+        failures += p50 > SEARCH_LATENCY_BUDGET_MS
+
+    # Broad queries must still put older name matches first and reach every match by paging
+    first = client.get('/api/products/search?q=heritage&limit=5').get_json()['products']
+    top = first[0]['name'] if first else None
+    print(f"heritage: top result {top!r}")
+    failures += top != 'Heritage Linen Jacket'
+    with app.app_context():
+        total = db.session.execute(text_sql(
+            "SELECT count(*) FROM product_search WHERE product_search MATCH 'heritage'")).scalar()
+    seen, offset = set(), 0
+    while offset is not None:
+        page = client.get(f'/api/products/search?q=heritage&limit=50&offset={offset}').get_json()
+        seen.update(p['id'] for p in page['products'])
+        offset = page['next_offset']
+    print(f"heritage: paged through {len(seen)} of {total} matches")
+    failures += len(seen) != total
+    return 1 if failures else 0
+
+def bench_search():
+    # 100k products would slow every later command down, so this runs in its own database
+    env = dict(os.environ, FARA3_DATABASE_URI='sqlite:///' + os.path.join(_bench_dir, 'search.db'))
+    result = subprocess.run([sys.executable, __file__, '--search-worker'], env=env,
+                            capture_output=True, text=True, encoding='utf-8')
+    print(result.stdout.rstrip() if result.returncode == 0 or result.stdout else result.stderr)
+    return result.returncode
+
+# =============== FACETED FILTERING ===============
+FACET_CATEGORIES = ['hoodies', 'tees', 'jackets', 'pants', 'knitwear', 'accessories']
+FACET_FILTERS = {
+    'none': ([], [], False, None, None),
+    'in stock': ([], [], True, None, None),
+    'two collections': (['streetwear', 'minimalist'], [], False, None, None),
+    'category + price': ([], ['hoodies', 'tees'], False, 25, 100),
+    'price inside buckets': ([], [], False, 30, 120),
+    'price inside one bucket': (['streetwear'], [], False, 60, 70),
+    'featured': ([], [], False, None, None, True),
+    'ids': ([], ['jackets'], False, 40, None, False, set(range(1, 3000, 30))),
+    'everything': (['streetwear', 'Pants'], ['jackets'], True, 50, 150, True),
+}
+FACET_BUDGET_MS = 5  # Per call, at any catalog size
+
+def counted_facets(collections, categories, in_stock, min_price, max_price, featured=False, product_ids=None):
+    """What facet_counts returns, computed with a COUNT(*) over product per facet"""
+    bucket = sum(db.cast(Product.price >= edge, db.Integer) for edge in PRICE_BUCKET_EDGES)
+    edges = (0,) + PRICE_BUCKET_EDGES + (None,)
+    if product_ids is None:
+        # Without ids the counts cover whole price buckets
+        if min_price is not None:
+            min_price = edges[sum(min_price >= edge for edge in PRICE_BUCKET_EDGES)]
+        if max_price is not None:
+            max_price = edges[sum(max_price > edge for edge in PRICE_BUCKET_EDGES) + 1]
+    conditions = {
+        'collection': [Collection.name.in_(collections)] if collections else [],
+        'category': [Product.category.in_(categories)] if categories else [],
+        'in_stock': [Product.stock > 0] if in_stock else [],
+        'price': ([Product.price >= min_price] if min_price is not None else []) +
+                 ([Product.price < max_price] if max_price is not None else []),
+        'featured': [Product.is_featured == True] if featured else [],
+        'ids': [Product.id.in_(product_ids)] if product_ids is not None else [],
+    }
+    def count_by(facet, column, *where):
+        query = db.select(column, db.func.count()).select_from(Product) \
+            .outerjoin(Collection, Collection.id == Product.collection_id).where(*where)
+        for other, condition in conditions.items():
+            if other != facet:
+                query = query.where(*condition)
+        return sorted(db.session.execute(query.group_by(column)).all())
+
+    in_stock_count = count_by('in_stock', db.literal(True), Product.stock > 0)
+    return {
+        'collection': [{'value': name, 'count': count}
+                       for name, count in count_by('collection', Collection.name, Collection.name.is_not(None))],
+        'category': [{'value': name, 'count': count}
+                     for name, count in count_by('category', Product.category, Product.category.is_not(None))],
+        'price': [{'min': edges[index], 'max': edges[index + 1], 'count': count}
+                  for index, count in count_by('price', bucket)],
+        'in_stock': in_stock_count[0][1] if in_stock_count else 0,
+        'price_range': {'min': min_price, 'max': max_price},
+    }
+
+def facets_worker(iterations=50):
+    """Grow a random catalog, churn it, and compare facet_counts with COUNT(*) at each size"""
+    initialize_database()
+    random.seed(24)
+    failures = 0
+    print(f"{'catalog':>8} {'summary rows':>12} {'facet_counts':>14} {'COUNT(*)':>12}  accurate")
+    inserted = 0
+    with app.app_context():
+        collection_ids = [col.id for col in Collection.query.all()]
+        for total in (1000, 10000, 100000):
+            new_ids = range(inserted, inserted + total - Product.query.count())
+            inserted += len(new_ids)
+            db.session.execute(Product.__table__.insert(), [{
+                'name': f"Facet Product {i}",
+                'price': random.choice((5.0, 9.99, 25.0, 30.0, 49.5, 50.0, 65.0, 75.0, 99.0, 120.0, 150.0, 199.0, 250.0, 400.0)),
+                'image_url': 'main.png',
+                'collection_id': random.choice(collection_ids + [None]),
+                'category': random.choice(FACET_CATEGORIES + [None]),
+                'stock': random.choice((0, 1, 5, 10, 10, 10)),
+                'created_at': datetime.utcnow(),
+                'is_featured': random.random() < 0.05,
+            } for i in new_ids])
+            db.session.commit()
+
+            # Churn through every kind of write the triggers have to follow
+            ids = [row_id for (row_id,) in db.session.execute(db.select(Product.id))]
+            for product_id in random.sample(ids, 200):
+                db.session.execute(db.update(Product).where(Product.id == product_id).values(
+                    stock=random.choice((0, 0, 3)), price=random.choice((10.0, 60.0, 300.0)),
+                    category=random.choice(FACET_CATEGORIES), collection_id=random.choice(collection_ids),
+                    is_featured=random.random() < 0.5))
+            db.session.execute(db.update(Product).where(Product.id.in_(random.sample(ids, 200)))
+                               .values(stock=Product.stock - 1))
+            db.session.execute(db.delete(Product).where(Product.id.in_(random.sample(ids, 50))))
+            db.session.commit()
+
+            accurate = all(facet_counts(*filters) == counted_facets(*filters) for filters in FACET_FILTERS.values())
+            summary_rows = db.session.query(ProductFacetCount).count()
+            timings = []
+            for compute in (facet_counts, counted_facets):
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    for filters in FACET_FILTERS.values():
+                        compute(*filters)
+                timings.append((time.perf_counter() - started) * 1000 / (iterations * len(FACET_FILTERS)))
+            print(f"{total:>8} {summary_rows:>12} {timings[0]:>11.3f} ms {timings[1]:>9.3f} ms  {accurate}")
+            failures += (not accurate) + (timings[0] > FACET_BUDGET_MS)
+    return 1 if failures else 0
+
+def bench_facets():
+    # 100k products would slow every later command down, so this runs in its own database
+    env = dict(os.environ, FARA3_DATABASE_URI='sqlite:///' + os.path.join(_bench_dir, 'facets.db'))
+    result = subprocess.run([sys.executable, __file__, '--facets-worker'], env=env,
+                            capture_output=True, text=True, encoding='utf-8')
+    print(result.stdout.rstrip() if result.returncode == 0 or result.stdout else result.stderr)
+    return result.returncode
+
+# =============== LOAD GENERATOR ===============
+def bench_loadgen(duration=3):
+    """Record the scenarios in-process, then replay the recording twice; the second replay must not
+    regress against the first, and a synthetic slowdown of one endpoint must be the only one flagged"""
+    loadgen = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loadgen_fara3.py')
+    recording = os.path.join(_bench_dir, 'loadgen.jsonl')
+    recorded_results = os.path.join(_bench_dir, 'loadgen-recorded.json')
+    baseline_results = os.path.join(_bench_dir, 'loadgen-baseline.json')
+    replayed_results = os.path.join(_bench_dir, 'loadgen-replayed.json')
+    # Without FARA3_* overrides each run builds its own scratch database
+    env = {name: value for name, value in os.environ.items() if not name.startswith('FARA3_')}
+    runs = []
+    # Same commit, same traffic, back to back: any regression reported here is a false alarm
+    for args in (['--duration', str(duration), '--trials', '1', '--record', recording, '--save', recorded_results],
+                 ['--replay', recording, '--speed', '0', '--save', baseline_results],
+                 ['--replay', recording, '--speed', '0', '--save', replayed_results, '--compare', baseline_results]):
+        result = subprocess.run([sys.executable, loadgen, '--users', '4', *args], env=env,
+                                capture_output=True, text=True, encoding='utf-8')
+        print(result.stdout.rstrip() if result.stdout else result.stderr)
+        if result.returncode != 0:
+            return 1
+        with open(args[args.index('--save') + 1], encoding='utf-8') as saved:
+            runs.append(json.load(saved))
+
+    # Slow one endpoint down by more than its own trial-to-trial spread
+    baseline = runs[1]
+    slowed = 'GET /api/products'
+    before = baseline['endpoints'][slowed]
+    factor = 1.5 * max(before['trial_p50_ms']) / min(before['trial_p50_ms'])
+    after = json.loads(json.dumps(baseline))
+    after['endpoints'][slowed]['trial_p50_ms'] = [ms * factor for ms in before['trial_p50_ms']]
+    after['endpoints'][slowed]['samples_ms'] = [ms * factor for ms in before['samples_ms']]
+    with redirect_stdout(io.StringIO()):
+        unchanged = loadgen_fara3.compare(baseline, baseline, 0.2)
+        flagged = loadgen_fara3.compare(after, baseline, 0.2)
+    print(f"{slowed} x{factor:.2f}: {flagged} regression(s) flagged, unchanged: {unchanged}")
+
+    with open(recording, encoding='utf-8') as recorded:
+        lines = sum(1 for _ in recorded)
+    totals = [run['endpoints']['*'] for run in runs]
+    replayed = [total['requests'] // run['trials'] for total, run in zip(totals, runs)]
+    print(f"recorded {lines} requests, replayed {replayed[1]} and {replayed[2]} per trial, "
+          f"errors {' / '.join(str(total['errors']) for total in totals)}")
+    return int(lines != totals[0]['requests'] or
+               any(total['requests'] != lines * run['trials'] for total, run in zip(totals[1:], runs[1:])) or
+               any(total['errors'] > 0 for total in totals) or
+               unchanged != 0 or flagged != 1)
+
+# =============== PAGINATION ===============
+def grow_catalog(total_products):
+    """Bulk-insert synthetic products until the catalog has total_products rows"""
+    with app.app_context():
+        existing = Product.query.count()
+        collection_ids = [col.id for col in Collection.query.all()]
+        rows = [{
+            'name': f"Synthetic Product {i}",
+            'description': "Synthetic catalog product " * 4,
+            'details': "Long synthetic product details. " * 20,
+            'price': 5.0 + i % 95,
+            'image_url': "main.png",
+            'collection_id': collection_ids[i % len(collection_ids)],
+            'category': "synthetic",
+            'stock': 10,
+            'created_at': datetime.utcnow(),
+            'is_featured': False
+        } for i in range(existing, total_products)]
+        if rows:
+            db.session.execute(Product.__table__.insert(), rows)
+            db.session.commit()
+
+def bench_pagination(iterations=50):
+    seed_catalog()
+    client = app.test_client()
+    failures = 0
+
+    print(f"{'catalog':>8} {'first page':>22} {'deep page':>22} {'fields=id,name,price':>26}")
+    for total in (1000, 10000, 50000):
+        grow_catalog(total)
+        catalog_cache.invalidate()
+        # Walk to a page near the end of the catalog to get a deep cursor
+        cursor = None
+        for _ in range(total // 200 - 1):
+            cursor = client.get(f"/api/products?fields=id&limit=200{'&cursor=' + cursor if cursor else ''}") \
+                .get_json()['next_cursor']
+        results = []
+        for url in ('/api/products', f'/api/products?cursor={cursor}', '/api/products?fields=id,name,price'):
+            size, _ = measure_requests(client, url, 1)
+            ms = time_requests(client, url, iterations, before_each=catalog_cache.invalidate)
+            results.append((size, ms))
+        print(f"{total:>8} " + " ".join(f"{size:>8} B {ms:8.3f} ms" for size, ms in results))
+        if any(size > 64 * 1024 for size, _ in results):
+            failures += 1
+
+    return failures
+
+# =============== ENTRY POINT ===============
+COMMANDS = {
+    'queries': bench_queries,
+    'cache': bench_cache,
+    'etag': bench_etag,
+    'indexes': bench_indexes,
+    'wal': bench_wal,
+    'cart': bench_cart,
+    'checkout': bench_checkout,
+    'orders': bench_orders,
+    'oversell': bench_oversell,
+    'ordernumbers': bench_ordernumbers,
+    'kdf': bench_kdf,
+    'tokens': bench_tokens,
+    'contact': bench_contact,
+    'startup': bench_startup,
+    'serialize': bench_serialize,
+    'json': bench_json,
+    'compress': bench_compress,
+    'assets': bench_assets,
+    'images': bench_images,
+    'search': bench_search,
+    'facets': bench_facets,
+    'loadgen': bench_loadgen,
+    'pagination': bench_pagination,
+}
+
+def main(argv):
+    if argv[1:] == ['--wal-worker']:
+        return wal_worker()
+    if argv[1:] == ['--order-number-worker']:
+        return order_number_worker()
+    if argv[1:] == ['--search-worker']:
+        return search_worker()
+    if argv[1:] == ['--facets-worker']:
+        return facets_worker()
+
+    names = argv[1:] or list(COMMANDS)
+    unknown = [name for name in names if name not in COMMANDS]
+    if unknown:
+        print(f"Unknown command(s): {', '.join(unknown)}. Choose from: {', '.join(COMMANDS)}")
+        return 2
+
+    failures = 0
+    for name in names:
+        print(f"\n=== {name} ===")
+        started = time.perf_counter()
+        failures += COMMANDS[name]() or 0
+        print(f"--- {name} finished in {time.perf_counter() - started:.2f}s")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
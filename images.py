@@ -0,0 +1,163 @@
+"""Resized image variants for the 𝐹𝒶𝓇𝒶`𝟥 storefront.
+
+Variants are rendered with Pillow the first time they are asked for and
+kept as files in a size-bounded directory, least recently used evicted
+first. File names carry the source's content digest, so an edited image
+never serves an old variant:
+
+    <stem>.<digest>.w<width>.<webp|jpg|png>
+
+Pillow is optional; without it `available` is False and callers serve
+the original file instead.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+available = Image is not None
+
+# Widths a variant can have; requested widths round up to the next one
+VARIANT_WIDTHS = (160, 320, 640, 960, 1280, 1920)
+
+# fmt query value -> (Pillow format, file extension, mimetype, save options)
+FORMATS = {
+    'webp': ('WEBP', '.webp', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', '.png', 'image/png', {'compress_level': 6}),
+}
+VARIANT_EXTENSIONS = {extension for _, extension, _, _ in FORMATS.values()}
+
+# A render's temp file untouched for this long was left by a dead process; younger ones may still be written
+STALE_TEMP_SECONDS = 15 * 60
+
+def variant_width(requested):
+    """Smallest of VARIANT_WIDTHS that is at least requested; the largest for None or anything wider"""
+    if requested is not None:
+        for width in VARIANT_WIDTHS:
+            if width >= requested:
+                return width
+    return VARIANT_WIDTHS[-1]
+
+def render_variant(source_path, target_path, width, fmt):
+    """Write source_path scaled down to at most width pixels wide and encoded as fmt"""
+    pil_format, _, _, options = FORMATS[fmt]
+    with Image.open(source_path) as original:
+        # JPEG sources decode straight at a reduced scale when that is still wide enough
+        original.draft('RGB', (width, max(1, original.height * width // original.width)))
+        image = ImageOps.exif_transpose(original)
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        image.save(target_path, pil_format, **options)
+
+class VariantCache:
+    """Directory of rendered variants bounded to max_bytes, evicting least recently used first.
+
+    The LRU order is kept in memory, rebuilt from file mtimes on first use,
+    and hits touch their file so it survives restarts. Requests for a
+    variant that is already being rendered wait for that render instead of
+    starting another one.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.renders = 0
+        self._files = None  # file name -> size, oldest first
+        self._size = 0
+        self._rendering = {}
+        self._lock = threading.Lock()
+
+    def path(self, source_path, digest, width, fmt):
+        """Path of the variant file, rendering it first unless it is cached"""
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        name = f"{stem}.{digest}.w{width}{FORMATS[fmt][1]}"
+        path = os.path.join(self.directory, name)
+
+        with self._lock:
+            self._load()
+            if name in self._files:
+                try:
+                    os.utime(path)
+                    self._files.move_to_end(name)
+                    return path
+                except FileNotFoundError:
+                    self._size -= self._files.pop(name)  # Removed behind our back, render it again
+            future = self._rendering.get(name)
+            if future is not None:
+                owner = False
+            else:
+                owner = True
+                future = self._rendering[name] = Future()
+
+        if not owner:
+            return future.result()
+
+        temp_path = None
+        try:
+            # Unique across threads and processes sharing the directory
+            descriptor, temp_path = tempfile.mkstemp(prefix=f"{name}.", suffix='.tmp', dir=self.directory)
+            os.close(descriptor)
+            render_variant(source_path, temp_path, width, fmt)
+            os.chmod(temp_path, 0o644)  # mkstemp creates it readable by its owner only
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except BaseException as error:
+            with self._lock:
+                del self._rendering[name]
+            future.set_exception(error)
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            self.renders += 1
+            self._files[name] = size
+            self._size += size
+            evicted = []
+            while self._size > self.max_bytes and len(self._files) > 1:
+                evicted_name, evicted_size = self._files.popitem(last=False)
+                self._size -= evicted_size
+                evicted.append(evicted_name)
+            del self._rendering[name]
+
+        for evicted_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, evicted_name))
+            except FileNotFoundError:
+                pass
+        future.set_result(path)
+        return path
+
+    def _load(self):
+        """Index the files already on disk, oldest first; call with the lock held"""
+        if self._files is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        stale_before = time.time() - STALE_TEMP_SECONDS
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith('.tmp'):
+                if entry.stat().st_mtime < stale_before:
+                    try:
+                        os.remove(entry.path)  # Left over from a render that was interrupted
+                    except FileNotFoundError:
+                        pass  # Another process cleaned it up first
+            elif os.path.splitext(entry.name)[1] in VARIANT_EXTENSIONS:
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        self._files = OrderedDict((name, size) for _, name, size in sorted(files))
+        self._size = sum(self._files.values())
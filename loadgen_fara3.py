@@ -0,0 +1,469 @@
+"""Load generator for the 𝐹𝒶𝓇𝒶`𝟥 backend.
+
+Virtual users loop over weighted scenarios (browse the catalog, add to
+cart, checkout, order history) until the run ends, either in-process
+through the Flask test client on a scratch database or against a running
+server over HTTP. Latency percentiles and throughput are reported per
+endpoint. Runs use a fixed seed and repeat --trials times, so results
+saved with --save on one commit can be checked against another with
+--compare, which exits non-zero when an endpoint regresses: its median
+latency in every trial is more than --tolerance above the baseline's
+slowest trial, and a Mann-Whitney test on all samples says the slowdown
+is not chance.
+
+Traffic can be recorded as JSONL (one request per line) and replayed
+later in place of the scenarios, with each recorded user's requests in
+their original order and timing.
+
+Usage:
+    python loadgen_fara3.py                                  - 10 users, three 10s trials, in-process
+    python loadgen_fara3.py --url http://127.0.0.1:5000       - the same load against a running server
+    python loadgen_fara3.py --users 20 --duration 30 --mix browse=8,cart=2,checkout=1,history=1
+    python loadgen_fara3.py --record traffic.jsonl           - also write every request to traffic.jsonl
+    python loadgen_fara3.py --replay traffic.jsonl --speed 0 - resend recorded traffic as fast as possible
+    python loadgen_fara3.py --save after.json --compare before.json
+"""
+import argparse
+import atexit
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote, urlsplit
+
+DEFAULT_MIX = 'browse=6,cart=2,checkout=1,history=1'
+PASSWORD = 'Load1234'
+MIN_COMPARE_REQUESTS = 100  # Fewer samples are too noisy to call a regression
+REGRESSION_P_VALUE = 0.01  # Mann-Whitney one-sided p below which a slowdown is not chance
+
+# =============== TRANSPORTS ===============
+class AppTransport:
+    """Requests through a Flask test client, without a server or sockets"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, body, headers):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+class HTTPTransport:
+    """Requests over one HTTP/1.1 connection, reopened whenever the server closes it"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.netloc, timeout=30)
+        self.prefix = parts.path.rstrip('/')
+
+    def send(self, method, path, body, headers):
+        headers = dict(headers)
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, self.prefix + path, body=data, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            raise
+
+def in_process_app():
+    """Import app1 on a scratch database with sample data and stock that never runs out"""
+    scratch_dir = tempfile.mkdtemp(prefix='fara3-load-')
+    atexit.register(shutil.rmtree, scratch_dir, ignore_errors=True)
+    os.environ.setdefault('FARA3_DATABASE_URI', 'sqlite:///' + os.path.join(scratch_dir, 'load.db'))
+    os.environ.setdefault('FARA3_IMAGE_CACHE_DIR', os.path.join(scratch_dir, 'image-variants'))
+    os.environ.setdefault('FARA3_SECRET_KEY', os.urandom(32).hex())
+
+    from app1 import app, db, initialize_database, Product
+    initialize_database()
+    with app.app_context():
+        db.session.execute(db.update(Product).values(stock=10 ** 9))
+        db.session.commit()
+    return app
+
+# =============== STATISTICS ===============
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def slower_p_value(after, before):
+    """One-sided Mann-Whitney U p-value for after being slower than before (normal approximation, tie-corrected)"""
+    ranked = sorted([(ms, True) for ms in after] + [(ms, False) for ms in before])
+    rank_sum = ties = 0
+    start = 0
+    while start < len(ranked):
+        end = start
+        while end < len(ranked) and ranked[end][0] == ranked[start][0]:
+            end += 1
+        # Tied samples share the mean of ranks start + 1 .. end
+        rank_sum += (start + end + 1) / 2 * sum(is_after for _, is_after in ranked[start:end])
+        ties += (end - start) ** 3 - (end - start)
+        start = end
+    n_after, n_before, n = len(after), len(before), len(ranked)
+    u = rank_sum - n_after * (n_after + 1) / 2
+    variance = n_after * n_before / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n_after * n_before / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+class Stats:
+    """Latency samples per endpoint name and trial, and error counts per endpoint name"""
+
+    def __init__(self):
+        self.samples = defaultdict(lambda: defaultdict(list))
+        self.errors = defaultdict(int)
+        self.trial = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, ms, ok):
+        with self._lock:
+            self.samples[name][self.trial].append(ms)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, elapsed):
+        """{endpoint: {requests, errors, rps, p50_ms, p95_ms, p99_ms, trial_p50_ms, samples_ms}}, '*' for all endpoints.
+        
+        Percentiles pool every trial; trial_p50_ms and samples_ms are what --compare tests.
+        """
+        endpoints = dict(sorted(self.samples.items()))
+        if endpoints:
+            everything = defaultdict(list)
+            for trials in endpoints.values():
+                for trial, samples in trials.items():
+                    everything[trial].extend(samples)
+            endpoints['*'] = everything
+        summary = {}
+        for name, trials in endpoints.items():
+            samples = [ms for trial in sorted(trials) for ms in trials[trial]]
+            summary[name] = {
+                'requests': len(samples),
+                'errors': self.errors[name] if name != '*' else sum(self.errors.values()),
+                'rps': round(len(samples) / elapsed, 1),
+                'p50_ms': round(percentile(samples, 50), 2),
+                'p95_ms': round(percentile(samples, 95), 2),
+                'p99_ms': round(percentile(samples, 99), 2),
+                'trial_p50_ms': [round(statistics.median(trials[trial]), 3) for trial in sorted(trials)],
+                'samples_ms': [round(ms, 3) for ms in samples],
+            }
+        return summary
+
+class Recorder:
+    """Appends every request a run sends to a JSONL file"""
+
+    def __init__(self, path, started):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.started = started
+        self._lock = threading.Lock()
+
+    def write(self, user, method, path, name, body, status, ms):
+        line = json.dumps({'t': round(time.perf_counter() - self.started, 4), 'user': user, 'method': method,
+                           'path': path, 'name': name, 'body': body, 'status': status, 'ms': round(ms, 3)})
+        with self._lock:
+            self.file.write(line + '\n')
+
+    def close(self):
+        self.file.close()
+
+# =============== VIRTUAL USERS ===============
+class VirtualUser:
+    """One signed-in shopper with its own connection, random stream and user id"""
+
+    def __init__(self, index, transport, catalog, seed, run_id):
+        self.index = index
+        self.transport = transport
+        self.stats = None  # Set once signed in, so sign-in is not part of the measured load
+        self.recorder = None
+        self.catalog = catalog
+        self.rng = random.Random(seed * 1000 + index)
+        self.email = f"load-{run_id}-{index}@fara3.test"
+        self.user_id = None
+        self.token = None
+
+    def request(self, method, path, name=None, body=None, record=True):
+        """Send one request, timed under name, and return its JSON body (None on failure).
+
+        path may contain {user_id}; it is recorded as written so a replay
+        fills in the replaying user's id.
+        """
+        name = name or f"{method} {path.split('?')[0]}"
+        headers = {'Authorization': f"Bearer {self.token}"} if self.token else {}
+        started = time.perf_counter()
+        try:
+            status, data = self.transport.send(method, path.format(user_id=self.user_id), body, headers)
+        except (OSError, http.client.HTTPException):
+            status, data = 0, b''
+        ms = (time.perf_counter() - started) * 1000
+        ok = 200 <= status < 400
+        if self.stats:
+            self.stats.add(name, ms, ok)
+        if record and self.recorder:
+            self.recorder.write(self.index, method, path, name, body, status, ms)
+        try:
+            return json.loads(data) if ok and data else None
+        except ValueError:
+            return None
+
+    def sign_in(self):
+        """Register (a 409 for an existing account is fine) and log in; a replay signs in by itself"""
+        credentials = {'name': f"Load User {self.index}", 'email': self.email, 'password': PASSWORD}
+        self.request('POST', '/api/auth/register', body=credentials, record=False)
+        data = self.request('POST', '/api/auth/login', body=credentials, record=False)
+        if data is None:
+            raise RuntimeError(f"{self.email} could not log in")
+        self.user_id = data['user']['id']
+        self.token = data['token']
+
+class Catalog:
+    """Collection names, product ids and search words to pick from, read once before the run"""
+
+    def __init__(self, transport):
+        _, collections = transport.send('GET', '/api/collections', None, {})
+        _, products = transport.send('GET', '/api/products?fields=id,name&limit=200', None, {})
+        self.collections = [collection['name'] for collection in json.loads(collections)['collections']]
+        self.products = json.loads(products)['products']
+        self.product_ids = [product['id'] for product in self.products]
+        self.search_words = sorted({word.lower() for product in self.products for word in product['name'].split()})
+        if not self.product_ids:
+            raise RuntimeError('The catalog has no products to load-test with')
+
+# =============== SCENARIOS ===============
+def browse(user):
+    """Landing page, a collection, a product page and a search"""
+    rng, catalog = user.rng, user.catalog
+    user.request('GET', '/api/collections')
+    user.request('GET', '/api/products/featured')
+    if catalog.collections:
+        user.request('GET', f"/api/collections/{quote(rng.choice(catalog.collections))}",
+                     name='GET /api/collections/<name>')
+    user.request('GET', '/api/products?limit=20')
+    user.request('GET', f"/api/products/{rng.choice(catalog.product_ids)}", name='GET /api/products/<id>')
+    if catalog.search_words:
+        user.request('GET', f"/api/products/search?q={quote(rng.choice(catalog.search_words)[:4])}",
+                     name='GET /api/products/search')
+
+def add_to_cart(user):
+    """Open a product, put it in the cart and look at the cart"""
+    product_id = user.rng.choice(user.catalog.product_ids)
+    user.request('GET', f"/api/products/{product_id}", name='GET /api/products/<id>')
+    user.request('POST', '/api/cart', body={'product_id': product_id, 'quantity': user.rng.randint(1, 3)})
+    user.request('GET', '/api/cart')
+
+def checkout(user):
+    """Order one to three products and clear the cart"""
+    product_ids = user.rng.sample(user.catalog.product_ids, min(len(user.catalog.product_ids), user.rng.randint(1, 3)))
+    user.request('POST', '/api/orders', body={
+        'items': [{'product_id': product_id, 'quantity': 1} for product_id in product_ids],
+        'payment_method': 'cod',
+        'shipping_address': 'Load Test Street 1',
+    })
+    user.request('DELETE', '/api/cart/clear/{user_id}', name='DELETE /api/cart/clear/<user_id>')
+
+def order_history(user):
+    """Order list summary, then the full first page"""
+    user.request('GET', '/api/orders/user/{user_id}?summary=true', name='GET /api/orders/user/<id>?summary')
+    user.request('GET', '/api/orders/user/{user_id}', name='GET /api/orders/user/<id>')
+
+SCENARIOS = {
+    'browse': browse,
+    'cart': add_to_cart,
+    'checkout': checkout,
+    'history': order_history,
+}
+
+def parse_mix(mix):
+    """'browse=6,cart=2' -> {'browse': 6.0, 'cart': 2.0}"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name.strip()!r}. Choose from: {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+# =============== RUNS ===============
+def run_scenarios(users, duration, weights, think_ms):
+    deadline = time.perf_counter() + duration
+    names, scenario_weights = list(weights), list(weights.values())
+
+    def loop(user):
+        while time.perf_counter() < deadline:
+            SCENARIOS[user.rng.choices(names, scenario_weights)[0]](user)
+            if think_ms:
+                time.sleep(user.rng.expovariate(1000 / think_ms))
+
+    run_threads(loop, users)
+
+def run_replay(users, entries_by_user, started, speed):
+    def replay(user):
+        for entry in entries_by_user[user.index]:
+            if speed:
+                delay = started + entry['t'] / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            user.request(entry['method'], entry['path'], name=entry['name'], body=entry['body'])
+
+    run_threads(replay, users)
+
+def run_threads(target, users):
+    threads = [threading.Thread(target=target, args=(user,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def read_recording(path):
+    """Recorded requests grouped by user index, in the order each user sent them"""
+    entries_by_user = defaultdict(list)
+    with open(path, encoding='utf-8') as recording:
+        for line in recording:
+            if line.strip():
+                entry = json.loads(line)
+                entries_by_user[entry['user']].append(entry)
+    for entries in entries_by_user.values():
+        entries.sort(key=lambda entry: entry['t'])
+    return entries_by_user
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+# =============== REPORTS ===============
+def print_report(result):
+    print(f"commit {result['commit']}  target {result['target']}  {result['users']} users  "
+          f"{result['trials']} x {result['elapsed_s'] / result['trials']:.2f}s  {result['replay'] or result['mix']}")
+    print(f"{'endpoint':<42} {'requests':>8} {'errors':>6} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, row in result['endpoints'].items():
+        print(f"{name:<42} {row['requests']:>8} {row['errors']:>6} {row['rps']:>8} "
+              f"{row['p50_ms']:>6} ms {row['p95_ms']:>6} ms {row['p99_ms']:>6} ms")
+
+def compare(result, baseline, tolerance):
+    """Print latency against baseline; returns the number of regressions.
+    
+    An endpoint is slower only when its median in every trial is more
+    than tolerance above the baseline's slowest trial, so one trial the
+    machine disturbed throughout does not count either way, and the
+    Mann-Whitney test on all samples rejects chance.
+    p95 is shown but never decides. With a fixed number of users,
+    throughput falls exactly when latency grows, so '*' covers it.
+    """
+    regressions = 0
+    print(f"\nagainst {baseline['commit']} ({tolerance:.0%} tolerance on per-trial p50, p < {REGRESSION_P_VALUE})")
+    print(f"{'endpoint':<42} {'slowest p50 before':>19} {'fastest p50 after':>18} {'p95 before':>11} {'p95 after':>11} {'p':>8}")
+    for name, row in result['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            print(f"{name:<42} {'new':>11}")
+            continue
+        problems = []
+        p_value = None
+        # Results saved before trials existed carry no samples to test
+        enough = min(row['requests'], before['requests']) >= MIN_COMPARE_REQUESTS and 'trial_p50_ms' in before
+        slowest_before = max(before['trial_p50_ms']) if enough else before['p50_ms']
+        fastest_after = min(row['trial_p50_ms']) if enough else row['p50_ms']
+        if enough:
+            p_value = slower_p_value(row['samples_ms'], before['samples_ms'])
+            if fastest_after > slowest_before * (1 + tolerance) and p_value < REGRESSION_P_VALUE:
+                problems.append('latency')
+        if row['errors'] / row['requests'] > before['errors'] / before['requests'] + 0.01:
+            problems.append('errors')
+        regressions += bool(problems)
+        print(f"{name:<42} {slowest_before:>16.2f} ms {fastest_after:>15.2f} ms {before['p95_ms']:>8} ms {row['p95_ms']:>8} ms "
+              f"{p_value if p_value is not None else '-':>8.2}  "
+              f"{'REGRESSED ' + ', '.join(problems) if problems else 'ok' if enough else 'too few requests'}")
+    return regressions
+
+# =============== ENTRY POINT ===============
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help='base URL of a running server; in-process on a scratch database when omitted')
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users (default 10)')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run scenarios for (default 10)')
+    parser.add_argument('--trials', type=int, default=3, help='times to repeat the run (default 3)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument('--think', type=float, default=0, help='mean pause between scenarios in ms (default 0)')
+    parser.add_argument('--seed', type=int, default=25, help='random seed; keep it fixed to compare runs')
+    parser.add_argument('--record', metavar='JSONL', help='write every request sent to this file')
+    parser.add_argument('--replay', metavar='JSONL', help='send recorded requests instead of running scenarios')
+    parser.add_argument('--speed', type=float, default=1, help='replay speed factor, 0 for no waiting (default 1)')
+    parser.add_argument('--save', metavar='JSON', help='write the results to this file')
+    parser.add_argument('--compare', metavar='JSON', help='saved results to check this run against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative median latency growth that never counts as a regression (default 0.2)')
+    args = parser.parse_args(argv[1:])
+
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as error:
+        parser.error(str(error))
+    entries_by_user = read_recording(args.replay) if args.replay else None
+
+    if args.url:
+        make_transport = lambda: HTTPTransport(args.url)
+    else:
+        app = in_process_app()
+        make_transport = lambda: AppTransport(app)
+
+    catalog = Catalog(make_transport())
+    run_id = f"{os.getpid()}-{int(time.time())}"
+    user_indexes = sorted(entries_by_user) if entries_by_user else range(args.users)
+    users = [VirtualUser(index, make_transport(), catalog, args.seed, run_id) for index in user_indexes]
+    for user in users:
+        user.sign_in()
+
+    stats = Stats()
+    elapsed = 0
+    for trial in range(args.trials):
+        stats.trial = trial
+        started = time.perf_counter()
+        recorder = Recorder(args.record, started) if args.record and trial == 0 else None  # One trial's traffic
+        for user in users:
+            user.stats, user.recorder = stats, recorder
+        if entries_by_user:
+            run_replay(users, entries_by_user, started, args.speed)
+        else:
+            run_scenarios(users, args.duration, weights, args.think)
+        elapsed += time.perf_counter() - started
+        if recorder:
+            recorder.close()
+
+    result = {
+        'commit': git_commit(),
+        'target': args.url or 'in-process',
+        'users': len(users),
+        'mix': weights,
+        'seed': args.seed,
+        'replay': args.replay,
+        'trials': args.trials,
+        'elapsed_s': round(elapsed, 2),
+        'endpoints': stats.summary(elapsed),
+    }
+    print_report(result)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as saved:
+            json.dump(result, saved, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as saved:
+            if compare(result, json.load(saved), args.tolerance):
+                return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,106 @@
+"""Password hashing for the 𝐹𝒶𝓇𝒶`𝟥 backend.
+
+Stored hashes are self-describing, so cost parameters can be raised at any
+time and older hashes are upgraded the next time their owner logs in:
+
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+
+Anything else is a legacy plaintext password from before hashing existed;
+it still verifies (in constant time) and always needs a rehash.
+"""
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Current cost parameters; see 'python bench_fara3.py kdf' to pick them
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600000
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r, dklen=HASH_BYTES)
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, dklen=HASH_BYTES)
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Hash a password with scrypt using the current (or given) cost parameters"""
+    salt = os.urandom(SALT_BYTES)
+    return f"scrypt${n}${r}${p}${salt.hex()}${_scrypt(password, salt, n, r, p).hex()}"
+
+def hash_password_pbkdf2(password, iterations=PBKDF2_ITERATIONS):
+    """PBKDF2-SHA256 hash, for platforms where OpenSSL lacks scrypt"""
+    salt = os.urandom(SALT_BYTES)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${_pbkdf2(password, salt, iterations).hex()}"
+
+def verify_password(password, stored):
+    """Check a password against any supported stored format"""
+    scheme, _, rest = stored.partition('$')
+    try:
+        if scheme == 'scrypt':
+            n, r, p, salt, expected = rest.split('$')
+            salt, expected = bytes.fromhex(salt), bytes.fromhex(expected)
+            actual = _scrypt(password, salt, int(n), int(r), int(p))
+        elif scheme == 'pbkdf2_sha256':
+            iterations, salt, expected = rest.split('$')
+            salt, expected = bytes.fromhex(salt), bytes.fromhex(expected)
+            actual = _pbkdf2(password, salt, int(iterations))
+        else:
+            return hmac.compare_digest(password.encode(), stored.encode())
+    except ValueError:
+        # A corrupt hash never matches, but still costs a real check so timing does not single it out
+        verify_password(password, dummy_hash())
+        return False
+    return hmac.compare_digest(actual, expected)
+
+@lru_cache(maxsize=1)
+def dummy_hash():
+    """Hash to verify against when there is no such user, so that costs as much as a real check"""
+    return hash_password(os.urandom(SALT_BYTES).hex())
+
+def needs_rehash(stored):
+    """True unless stored is a scrypt hash with the current cost parameters"""
+    return not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool already has max_pending jobs queued"""
+
+class HashingPool:
+    """Bounded thread pool for KDF work.
+
+    hashlib's scrypt and PBKDF2 release the GIL, so running them here caps
+    how many cores logins can take at once while other request threads keep
+    serving. Jobs beyond max_pending are refused instead of queueing forever.
+    """
+
+    def __init__(self, workers, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fara3-kdf')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def run(self, fn, *args, timeout=None):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout)
+
+    def hash(self, password):
+        return self.run(hash_password, password)
+
+    def verify(self, password, stored):
+        return self.run(verify_password, password, stored)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
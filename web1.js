@@ -3,6 +3,12 @@
 const API_BASE_URL = 'http://127.0.0.1:5000/api';
 let isBackendConnected = false;
 let currentUserId = null;
+let authToken = null;
+
+// Headers for cart/order calls, which require the token issued at login
+function authHeaders(headers = {}) {
+    return authToken ? { ...headers, 'Authorization': `Bearer ${authToken}` } : headers;
+}
 
 // Test backend connection
 async function checkBackendConnection() {
@@ -33,6 +39,41 @@ async function checkBackendConnection() {
 // Initialize connection check
 checkBackendConnection();
 
+// =============== STATIC ASSETS ===============
+const ASSET_BASE_URL = 'http://127.0.0.1:5000/assets';
+const IMAGE_BASE_URL = 'http://127.0.0.1:5000/img';
+let assetManifest = {};
+
+// Content-hashed, long-cached URL for a local file, or the plain name when the backend doesn't know it
+function assetUrl(name) {
+    const hashed = assetManifest[(name || '').trim()];
+    return hashed ? `${ASSET_BASE_URL}/${encodeURIComponent(hashed)}` : name;
+}
+
+// Resized copy of a local image for display at about `width` CSS pixels (doubled for high-DPI screens)
+function imageUrl(name, width) {
+    const hashed = assetManifest[(name || '').trim()];
+    return hashed ? `${IMAGE_BASE_URL}/${encodeURIComponent(hashed)}?w=${width * (window.devicePixelRatio > 1 ? 2 : 1)}` : name;
+}
+
+// Point every local <img> at its hashed URL once the backend's manifest arrives
+async function loadAssetManifest() {
+    try {
+        const response = await fetch(`${ASSET_BASE_URL}/manifest.json`, { mode: 'cors' });
+        if (!response.ok) return;
+        assetManifest = await response.json();
+        document.querySelectorAll('img[src]').forEach(img => {
+            const src = img.getAttribute('src');
+            if (!assetManifest[src.trim()]) return;
+            img.src = img.closest('.card-collection') ? imageUrl(src, 640) : assetUrl(src);
+        });
+    } catch (error) {
+        console.log('⚠️ Asset manifest not available. Using local image files.');
+    }
+}
+
+loadAssetManifest();
+
 
 const collectionProducts = {
     "minimalist": [
@@ -308,6 +349,7 @@ class AuthSystem {
                 // Store user data from backend
                 this.currentUser = data.user;
                 currentUserId = data.user.id;
+                authToken = data.token;
                 localStorage.setItem('currentUser', JSON.stringify(data.user));
                 this.updateUI();
                 this.updateCartButtonStates();
@@ -332,7 +374,9 @@ class AuthSystem {
         if (!isBackendConnected || !currentUserId) return;
         
         try {
-            const response = await fetch(`${API_BASE_URL}/cart?user_id=${currentUserId}`);
+            const response = await fetch(`${API_BASE_URL}/cart`, {
+                headers: authHeaders()
+            });
             const data = await response.json();
             
             if (response.ok && data.cart_items) {
@@ -349,6 +393,8 @@ class AuthSystem {
                     cart = backendCart;
                     saveCart();
                     renderCart();
+                } else if (backendCart.length === 0) {
+                    await this.pushLocalCartToBackend();
                 }
             }
         } catch (error) {
@@ -356,8 +402,44 @@ class AuthSystem {
         }
     }
 
+    // Upload the whole local cart in one batched PATCH
+    async pushLocalCartToBackend() {
+        if (!isBackendConnected || !currentUserId || cart.length === 0) return;
+        
+        try {
+            const response = await fetch(`${API_BASE_URL}/cart`, {
+                method: 'PATCH',
+                headers: authHeaders({
+                    'Content-Type': 'application/json',
+                }),
+                body: JSON.stringify({
+                    operations: cart.map(item => ({
+                        product_name: item.name,
+                        quantity_delta: item.qty
+                    }))
+                })
+            });
+            
+            if (!response.ok) {
+                console.error('Failed to sync local cart to backend');
+                return;
+            }
+            
+            // Items the online catalog doesn't carry stay in the local cart only
+            const data = await response.json();
+            if (data.unknown_products && data.unknown_products.length > 0) {
+                console.warn('Not synced to backend cart:', data.unknown_products);
+                this.showNotification(`Saved on this device only: ${data.unknown_products.join(', ')}`, 'info');
+            }
+        } catch (error) {
+            console.error('Error syncing local cart to backend:', error);
+        }
+    }
+
     logout() {
         this.currentUser = null;
+        currentUserId = null;
+        authToken = null;
         localStorage.removeItem('currentUser');
         this.updateUI();
         this.updateCartButtonStates();
@@ -816,7 +898,7 @@ class AuthSystem {
                         <div class="order-items">
                             ${order.items.map(item => `
                                 <div class="order-item">
-                                    <img src="${item.img}" alt="${item.name}">
+                                    <img src="${imageUrl(item.img, 160)}" alt="${item.name}">
                                     <div class="order-item-info">
                                         <p class="order-item-name">${item.name}</p>
                                         <p class="order-item-price">$${item.price} × ${item.qty}</p>
@@ -1181,7 +1263,7 @@ function showCollectionGallery(collectionName) {
             const productElement = document.createElement('div');
             productElement.className = 'gallery-item';
             productElement.innerHTML = `
-                <img src="${product.image}" alt="${product.name}" loading="lazy">
+                <img src="${imageUrl(product.image, 640)}" alt="${product.name}" loading="lazy">
                 <div class="content">
                     <h4>${product.name}</h4>
                     <p>${product.description}</p>
@@ -1602,6 +1684,9 @@ function initCart() {
     renderCart();
 }
 
+// Product name -> backend id, filled lazily by addItemToCart
+const productIdsByName = new Map();
+
 async function addItemToCart(name, price, img) {
     // Check if user is logged in
     if (!authSystem.currentUser) {
@@ -1611,18 +1696,16 @@ async function addItemToCart(name, price, img) {
     }
 
     // Find product ID from backend
-    let productId = null;
-    if (isBackendConnected) {
+    let productId = productIdsByName.get(name) || null;
+    if (isBackendConnected && !productId) {
         try {
-            // Search for product in backend
-            const response = await fetch(`${API_BASE_URL}/products`);
+            // Indexed lookup of this one product instead of downloading the catalog
+            const response = await fetch(`${API_BASE_URL}/products/lookup?name=${encodeURIComponent(name)}`);
             const data = await response.json();
             
-            if (response.ok) {
-                const product = data.products.find(p => p.name === name);
-                if (product) {
-                    productId = product.id;
-                }
+            if (response.ok && data.product) {
+                productId = data.product.id;
+                productIdsByName.set(name, productId);
             }
         } catch (error) {
             console.error('Error finding product:', error);
@@ -1634,11 +1717,10 @@ async function addItemToCart(name, price, img) {
         try {
             const response = await fetch(`${API_BASE_URL}/cart`, {
                 method: 'POST',
-                headers: {
+                headers: authHeaders({
                     'Content-Type': 'application/json',
-                },
+                }),
                 body: JSON.stringify({
-                    user_id: currentUserId,
                     product_id: productId,
                     quantity: 1
                 })
@@ -1685,7 +1767,7 @@ function renderCart() {
         const div = document.createElement("div");
         div.classList.add("cart-item");
         div.innerHTML = `
-            <img src="${item.img}" alt="${item.name}">
+            <img src="${imageUrl(item.img, 160)}" alt="${item.name}">
             <div style="flex: 1;">
                 <h4 style="margin: 0 0 5px 0;">${item.name}</h4>
                 <p style="margin: 0 0 10px 0;">$${item.price}</p>